@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from formula_based_water_req import BACKEND_BASE_URL, build_backend_payload, calculate_water_for_prediction
+
+# Status codes worth retrying: rate limiting and transient server/proxy (ngrok) errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Only these are retried after a timeout or error status: a POST (store-prediction) may
+# already have been stored, so it is retried only when the connection could not be opened
+IDEMPOTENT_METHODS = {'GET', 'HEAD'}
+
+# ================== ASYNC BACKEND CLIENT ==================
+class BackendRequestError(Exception):
+    """Raised when a backend request still fails after all retries"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+class AsyncBackendClient:
+    """
+    Asyncio client for the backend prediction endpoints.
+
+    One pooled aiohttp session is shared by all requests, at most `max_concurrency`
+    requests are in flight, every attempt has a `timeout` (seconds), and transient
+    failures (timeouts, connection errors, 429/5xx) of GET requests are retried up to
+    `retries` times with full-jitter exponential backoff. POSTs are retried only when the
+    connection could not be opened. Use as `async with AsyncBackendClient() as client:`.
+    """
+
+    def __init__(self, base_url=BACKEND_BASE_URL, max_concurrency=20, timeout=10, retries=3, backoff=0.5):
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_count = 0
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=30)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    async def _request(self, method, path, **kwargs):
+        url = f"{self.base_url}{path}"
+        idempotent = method in IDEMPOTENT_METHODS
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    async with self._session.request(method, url, **kwargs) as response:
+                        if response.status not in RETRY_STATUSES:
+                            if response.status >= 400:
+                                raise BackendRequestError(f"{method} {path} returned {response.status}: {await response.text()}", response.status)
+                            try:
+                                return await response.json()
+                            except (aiohttp.ContentTypeError, ValueError) as e:
+                                raise BackendRequestError(f"{method} {path} returned a non-JSON body: {e!r}", response.status)
+                        error = BackendRequestError(f"{method} {path} returned {response.status}", response.status)
+                        retryable = idempotent
+            except aiohttp.ClientConnectorError as e:
+                error = BackendRequestError(f"{method} {path} failed: {e!r}")
+                retryable = True  # nothing was sent
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = BackendRequestError(f"{method} {path} failed: {e!r}")
+                retryable = idempotent
+            if not retryable:
+                break
+            if attempt < self.retries:
+                self.retry_count += 1
+                # Full jitter: sleep a random time up to the exponential backoff ceiling
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+        raise error
+
+    async def get_latest_prediction(self):
+        """GET /api/crop/latest-prediction"""
+        return await self._request("GET", "/api/crop/latest-prediction")
+
+    async def store_prediction(self, payload):
+        """POST /api/crop/store-prediction"""
+        return await self._request("POST", "/api/crop/store-prediction", json=payload)
+
+# ================== PIPELINE ==================
+async def process_prediction(client, executor, prediction_data=None):
+    """
+    One fetch -> compute -> store job. The CPU-bound calculation runs in `executor` so
+    the event loop keeps other jobs' network I/O moving meanwhile.
+    """
+    if prediction_data is None:
+        prediction_data = await client.get_latest_prediction()
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(executor, calculate_water_for_prediction, prediction_data)
+    if not result:
+        return False
+    await client.store_prediction(build_backend_payload(result))
+    return True
+
+async def run_pipeline(client, jobs, workers=4):
+    """
+    Run many jobs concurrently (`jobs` is a list of prediction records, or None entries
+    to fetch the latest prediction). Returns (succeeded, failed).
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = await asyncio.gather(
+            *(process_prediction(client, executor, job) for job in jobs),
+            return_exceptions=True
+        )
+    succeeded = sum(1 for outcome in outcomes if outcome is True)
+    return succeeded, len(outcomes) - succeeded
+
+# ================== THROUGHPUT MEASUREMENT ==================
+def measure_throughput(jobs=200, latency=0.05, max_concurrency=20):
+    """
+    Compare jobs/second of the blocking requests path and the async pipeline against a
+    local stub backend that answers every request after `latency` seconds.
+    """
+    import contextlib
+    import io
+    import requests
+    from formula_based_water_req import get_latest_prediction_data, send_water_calculation_to_backend
+    from stub_upstreams import StubBackend
+
+    with StubBackend(latency=latency) as backend, contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        with requests.Session() as session:
+            for _ in range(jobs):
+                prediction_data = get_latest_prediction_data(backend.base_url, session=session)
+                result = calculate_water_for_prediction(prediction_data)
+                send_water_calculation_to_backend(result, backend.base_url, session=session)
+        blocking_seconds = time.perf_counter() - started
+
+        async def run_async():
+            async with AsyncBackendClient(backend.base_url, max_concurrency=max_concurrency) as client:
+                return await run_pipeline(client, [None] * jobs)
+
+        started = time.perf_counter()
+        succeeded, failed = asyncio.run(run_async())
+        async_seconds = time.perf_counter() - started
+
+    return {
+        'jobs': jobs,
+        'latency_s': latency,
+        'blocking_jobs_per_s': round(jobs / blocking_seconds, 1),
+        'async_jobs_per_s': round(jobs / async_seconds, 1),
+        'async_succeeded': succeeded,
+        'async_failed': failed
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure async pipeline throughput against a local stub backend")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub response delay in seconds")
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    print(measure_throughput(args.jobs, args.latency, args.concurrency))
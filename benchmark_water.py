@@ -0,0 +1,248 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+import formula_based_water_req as water
+from water_metrics import set_quiet
+
+BENCHMARK_DIR = 'benchmarks'
+HISTORY_PATH = os.path.join(BENCHMARK_DIR, 'history.jsonl')
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+GOLDEN_PATH = os.path.join(BENCHMARK_DIR, 'golden_outputs.json')
+
+BATCH_SIZES = (1, 10, 100, 1000, 10000, 100000)
+BATCH_CHUNK = 2000  # fields per calculate_crop_water_batch call, bounds memory for the big batches
+GOLDEN_PLANTING_DATES = ('2026-01-15', '2026-06-01', '2026-10-20')
+GOLDEN_WEATHER = [
+    {'temp_min': 24.5, 'temp_max': 38.2, 'humidity': 48, 'wind_speed': 3.1},
+    {'temp_min': 23.0, 'temp_max': 35.0, 'humidity': 72, 'wind_speed': 1.4},
+    {'temp_min': 21.8, 'temp_max': 33.6, 'humidity': 85, 'wind_speed': 0.8},
+]
+
+# ================== MEASUREMENT ==================
+MIN_SAMPLE_SECONDS = 0.05  # sub-millisecond calls are looped until a sample lasts this long
+
+def measure(name, func, items=1, repeat=3):
+    """
+    Time `func` (best of `repeat` samples, per call) and measure its peak traced memory
+    in one extra run. `items` is the number of fields/values one call processes, for throughput.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        func()
+        first = time.perf_counter() - started
+        loops = max(1, int(MIN_SAMPLE_SECONDS / first)) if first else 1
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(loops):
+                func()
+            timings.append((time.perf_counter() - started) / loops)
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    wall = min(timings)
+    return {
+        'name': name,
+        'wall_s': round(wall, 6),
+        'items': items,
+        'items_per_s': round(items / wall, 1) if wall else None,
+        'peak_kb': round(peak / 1024, 1)
+    }
+
+def _fields(count):
+    """`count` fields cycling through every crop, soil and a spread of planting dates"""
+    crops = list(water.PROPERTY_REGISTRY.crops())
+    soils = list(water.PROPERTY_REGISTRY.soils())
+    return [
+        {
+            'crop_name': crops[i % len(crops)],
+            'soil_type': soils[(i // len(crops)) % len(soils)],
+            'planting_date': f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+            'weather_data': GOLDEN_WEATHER if i % 2 else None
+        }
+        for i in range(count)
+    ]
+
+def _run_batch(fields):
+    for start in range(0, len(fields), BATCH_CHUNK):
+        water.calculate_crop_water_batch(fields[start:start + BATCH_CHUNK])
+
+# ================== SUITE ==================
+def run_suite(max_batch=max(BATCH_SIZES), repeat=3):
+    """Run every benchmark and return the list of measurements"""
+    results = []
+    rng = np.random.default_rng(0)
+    crops = water.PROPERTY_REGISTRY.crops()
+    soils = water.PROPERTY_REGISTRY.soils()
+
+    # CSV loaders and the cached registry
+    results.append(measure('load_soil_properties', lambda: water.load_soil_properties('soil_properties.csv'), repeat=repeat))
+    results.append(measure('load_crop_properties', lambda: water.load_crop_properties('crop_properties.csv'), repeat=repeat))
+    results.append(measure('registry_lookup', lambda: (water.PROPERTY_REGISTRY.soils(), water.PROPERTY_REGISTRY.crops()), repeat=repeat))
+
+    # ETo kernels
+    n = 10000
+    tmin, tmax = rng.uniform(15, 28, n), rng.uniform(28, 42, n)
+    doy = rng.integers(1, 366, n)
+    scalar_args = list(zip(tmin.tolist(), tmax.tolist(), doy.tolist()))
+    results.append(measure('calculate_eto', lambda: [water.calculate_eto(a, b, 150, 9.2088, d) for a, b, d in scalar_args], n, repeat))
+    results.append(measure('calculate_eto_batch', lambda: water.calculate_eto_batch(tmin, tmax, 150, 9.2088, doy), n, repeat))
+
+    # Growth stage lookups
+    rice = crops['Rice']
+    results.append(measure('get_growth_stage', lambda: [water.get_growth_stage(rice, day) for _ in range(20) for day in range(150)], 3000, repeat))
+
+    # One season per crop x soil (season lengths differ per crop) with both schedulers
+    for crop in crops:
+        for soil in soils:
+            for scheduler in ('daily', 'event'):
+                results.append(measure(
+                    f'calculate_crop_water[{crop}|{soil}|{scheduler}]',
+                    lambda crop=crop, soil=soil, scheduler=scheduler: water.calculate_crop_water(crop, soil, '2026-06-01', scheduler=scheduler),
+                    repeat=repeat
+                ))
+
+    # Batch engine at increasing field counts
+    for size in BATCH_SIZES:
+        if size > max_batch:
+            break
+        fields = _fields(size)
+        results.append(measure(f'calculate_crop_water_batch[{size}]', lambda fields=fields: _run_batch(fields), size,
+                               repeat=1 if size >= 10000 else repeat))
+    return results
+
+# ================== GOLDEN OUTPUTS ==================
+def golden_summary(output):
+    """
+    Compact fingerprint of one calculate_crop_water result: its totals and counts as
+    stored, plus a SHA-256 of the canonical JSON of the full irrigation schedule
+    """
+    output = json.loads(json.dumps(output, default=water.json_default))
+    schedule = json.dumps(output.pop('schedule'), sort_keys=True, separators=(',', ':'))
+    output['schedule_sha256'] = hashlib.sha256(schedule.encode()).hexdigest()
+    return output
+
+def golden_outputs():
+    """Summaries of calculate_crop_water for every crop x soil x golden planting date, with and without forecast"""
+    outputs = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for crop in water.PROPERTY_REGISTRY.crops():
+            for soil in water.PROPERTY_REGISTRY.soils():
+                for planting_date in GOLDEN_PLANTING_DATES:
+                    for label, weather in (('default', None), ('forecast', GOLDEN_WEATHER)):
+                        outputs[f"{crop}|{soil}|{planting_date}|{label}"] = golden_summary(
+                            water.calculate_crop_water(crop, soil, planting_date, weather_data=weather))
+    return outputs
+
+def check_golden():
+    """Compare the daily, event and batch paths with the stored golden outputs; returns mismatching keys"""
+    with open(GOLDEN_PATH, 'r') as file:
+        golden = json.load(file)
+    keys = list(golden)
+    fields = []
+    for key in keys:
+        crop, soil, planting_date, label = key.split('|')
+        fields.append({'crop_name': crop, 'soil_type': soil, 'planting_date': planting_date,
+                       'weather_data': GOLDEN_WEATHER if label == 'forecast' else None})
+    with contextlib.redirect_stdout(io.StringIO()):
+        daily = [water.calculate_crop_water(**field) for field in fields]
+        event = [water.calculate_crop_water(**field, scheduler='event') for field in fields]
+        batch = water.calculate_crop_water_batch(fields)
+    mismatches = []
+    for key, *outputs in zip(keys, daily, event, batch):
+        for path, output in zip(('daily', 'event', 'batch'), outputs):
+            if golden_summary(output) != golden[key]:
+                mismatches.append(f"{key} ({path})")
+    return mismatches
+
+# ================== HISTORY AND REGRESSIONS ==================
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def record_history(results):
+    record = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results
+    }
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    with open(HISTORY_PATH, 'a') as file:
+        file.write(json.dumps(record) + "\n")
+    return record
+
+def find_regressions(results, baseline, threshold):
+    """Benchmarks whose wall time grew by more than `threshold` (fraction) over the baseline"""
+    baseline_times = {entry['name']: entry['wall_s'] for entry in baseline['results']}
+    regressions = []
+    for entry in results:
+        previous = baseline_times.get(entry['name'])
+        if previous and entry['wall_s'] > previous * (1 + threshold):
+            regressions.append((entry['name'], previous, entry['wall_s']))
+    return regressions
+
+# ================== EXECUTE BENCHMARKS ==================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Water calculator benchmarks and regression checks")
+    parser.add_argument("--max-batch", type=int, default=max(BATCH_SIZES), help="Largest batch size to run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--update-golden", action="store_true", help="Regenerate the golden outputs")
+    parser.add_argument("--golden-only", action="store_true", help="Only run the golden-output check")
+    args = parser.parse_args()
+    set_quiet()  # measure the calculator without instrumentation or log lines
+
+    if args.update_golden:
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        with open(GOLDEN_PATH, 'w') as file:
+            json.dump(golden_outputs(), file, indent=1, sort_keys=True)
+        print(f"Golden outputs written to {GOLDEN_PATH}")
+
+    failed = False
+    mismatches = check_golden()
+    if mismatches:
+        failed = True
+        print(f"GOLDEN MISMATCH in {len(mismatches)} outputs:")
+        for key in mismatches[:20]:
+            print(f"  {key}")
+    else:
+        print("Golden outputs match for daily, event and batch paths")
+
+    if not args.golden_only:
+        results = run_suite(args.max_batch, args.repeat)
+        record_history(results)
+        print(f"{'benchmark':<58} {'wall s':>10} {'items/s':>12} {'peak KB':>10}")
+        for entry in results:
+            print(f"{entry['name']:<58} {entry['wall_s']:>10} {entry['items_per_s'] or '':>12} {entry['peak_kb']:>10}")
+
+        if args.save_baseline:
+            with open(BASELINE_PATH, 'w') as file:
+                json.dump({'commit': _git_commit(), 'results': results}, file, indent=1)
+            print(f"Baseline written to {BASELINE_PATH}")
+        elif os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, 'r') as file:
+                regressions = find_regressions(results, json.load(file), args.threshold)
+            for name, previous, current in regressions:
+                print(f"REGRESSION {name}: {previous}s -> {current}s")
+            failed = failed or bool(regressions)
+
+    sys.exit(1 if failed else 0)
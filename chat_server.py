@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+# ================== SESSIONS ==================
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+class ChatSession:
+    """One farmer's conversation plus its per-turn latencies (ms)"""
+
+    def __init__(self, conversation):
+        self.id = uuid.uuid4().hex
+        self.conversation = conversation
+        self.created = time.time()
+        self.last_active = self.created
+        self.turns = 0
+        self.latencies = deque(maxlen=200)
+        self.lock = asyncio.Lock()  # one turn at a time per session
+
+    def stats(self):
+        latencies = list(self.latencies)
+        return {
+            'session_id': self.id,
+            'stage': self.conversation.stage,
+            'farming_info': self.conversation.farming_data.dict(),
+            'turns': self.turns,
+            'latency_ms': {
+                'last': latencies[-1] if latencies else None,
+                'p50': _percentile(latencies, 50),
+                'p95': _percentile(latencies, 95),
+                'max': max(latencies) if latencies else None
+            }
+        }
+
+class _UpstreamLimit:
+    """Caps concurrent calls to one upstream and records how long callers queued for a slot"""
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.in_flight = 0
+        self.wait_s = 0.0
+        self.busy_s = 0.0
+
+    def wrap(self, func):
+        def call(*args, **kwargs):
+            queued = time.perf_counter()
+            with self._slots:
+                started = time.perf_counter()
+                with self._lock:
+                    self.in_flight += 1
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    with self._lock:
+                        self.in_flight -= 1
+                        self.calls += 1
+                        self.wait_s += started - queued
+                        self.busy_s += time.perf_counter() - started
+        return call
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'calls': self.calls,
+                'in_flight': self.in_flight,
+                'avg_wait_ms': round(self.wait_s * 1000 / self.calls, 1) if self.calls else None,
+                'avg_call_ms': round(self.busy_s * 1000 / self.calls, 1) if self.calls else None
+            }
+
+# ================== CHAT SERVER ==================
+class ChatServer:
+    """
+    Asyncio HTTP front end running many llm.FarmerConversation sessions at once.
+
+    Routes:
+      POST /sessions                  start a conversation -> {session_id, reply}
+      POST /sessions/{id}/messages    {"text": ...} -> {reply, stage, farming_info, latency_ms}
+      GET  /sessions/{id}             session state and latency percentiles
+      DELETE /sessions/{id}           end a conversation
+      GET  /stats                     server-wide counters and upstream usage
+
+    Conversations call the blocking llm helpers on a thread pool. At most
+    `openrouter_concurrency` OpenRouter calls and `backend_concurrency` get-crop calls
+    run at once; sessions idle for `session_ttl` seconds are dropped.
+    """
+
+    def __init__(self, openrouter_concurrency=16, backend_concurrency=8, workers=64, session_ttl=1800):
+        import llm  # imported here: llm checks OPENROUTER_API_KEY at import time
+        self.llm = llm
+        self.openrouter = _UpstreamLimit('openrouter', openrouter_concurrency)
+        self.backend = _UpstreamLimit('backend', backend_concurrency)
+        self.extract = self.openrouter.wrap(llm.extract_farming_info)
+        self.submit = self.backend.wrap(llm.send_to_backend)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chat')
+        self.session_ttl = session_ttl
+        self.sessions = {}
+        self.started = time.time()
+        self.messages = 0
+        self.errors = 0
+
+    def app(self):
+        app = web.Application()
+        app.add_routes([
+            web.post('/sessions', self.create_session),
+            web.post('/sessions/{session_id}/messages', self.post_message),
+            web.get('/sessions/{session_id}', self.get_session),
+            web.delete('/sessions/{session_id}', self.delete_session),
+            web.get('/stats', self.stats)
+        ])
+        app.on_startup.append(self._start_reaper)
+        app.on_cleanup.append(self._stop)
+        return app
+
+    def _session(self, request):
+        session = self.sessions.get(request.match_info['session_id'])
+        if session is None:
+            raise web.HTTPNotFound(text='{"error": "Unknown session"}', content_type='application/json')
+        return session
+
+    async def create_session(self, request):
+        conversation = self.llm.FarmerConversation(extract=self.extract, submit=self.submit)
+        session = ChatSession(conversation)
+        self.sessions[session.id] = session
+        return web.json_response({'session_id': session.id, 'reply': f"{conversation.GREETING}\n{conversation.prompt()}"})
+
+    async def post_message(self, request):
+        session = self._session(request)
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict) or not isinstance(body.get('text', ''), str):
+            return web.json_response({'error': 'Body must be a JSON object with a "text" string'}, status=400)
+        text = body.get('text', '')
+
+        async with session.lock:
+            started = time.perf_counter()
+            try:
+                reply = await asyncio.get_running_loop().run_in_executor(self.executor, session.conversation.handle, text)
+            except Exception as e:
+                self.errors += 1
+                return web.json_response({'error': f"Upstream failure: {e}"}, status=502)
+            latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            session.latencies.append(latency_ms)
+            session.turns += 1
+            session.last_active = time.time()
+            self.messages += 1
+
+        return web.json_response({
+            'reply': reply,
+            'stage': session.conversation.stage,
+            'farming_info': session.conversation.farming_data.dict(),
+            'latency_ms': latency_ms
+        })
+
+    async def get_session(self, request):
+        return web.json_response(self._session(request).stats())
+
+    async def delete_session(self, request):
+        session = self._session(request)
+        del self.sessions[session.id]
+        return web.json_response(session.stats())
+
+    async def stats(self, request):
+        latencies = [latency for session in self.sessions.values() for latency in session.latencies]
+        return web.json_response({
+            'uptime_s': round(time.time() - self.started, 1),
+            'active_sessions': len(self.sessions),
+            'messages': self.messages,
+            'errors': self.errors,
+            'latency_ms': {'p50': _percentile(latencies, 50), 'p95': _percentile(latencies, 95), 'p99': _percentile(latencies, 99)},
+            'upstreams': {'openrouter': self.openrouter.stats(), 'backend': self.backend.stats()},
+            'extraction': self.llm.extraction_stats(),
+            'openrouter_limiter': self.llm.LIMITER.stats()
+        })
+
+    async def _reap_idle_sessions(self):
+        while True:
+            await asyncio.sleep(min(60, self.session_ttl))
+            cutoff = time.time() - self.session_ttl
+            for session_id in [sid for sid, session in self.sessions.items() if session.last_active < cutoff]:
+                del self.sessions[session_id]
+
+    async def _start_reaper(self, app):
+        self._reaper = asyncio.create_task(self._reap_idle_sessions())
+
+    async def _stop(self, app):
+        self._reaper.cancel()
+        self.executor.shutdown(wait=False)
+
+# ================== EXECUTE SERVER ==================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-session farmer chat server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--openrouter-concurrency", type=int, default=16)
+    parser.add_argument("--backend-concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=64, help="Threads running the blocking upstream calls")
+    parser.add_argument("--stub", action="store_true", help="Use local stand-ins for OpenRouter and the backend")
+    args = parser.parse_args()
+
+    stubs = []
+    if args.stub:
+        from stub_upstreams import StubBackend, StubOpenRouter
+        stubs = [StubOpenRouter(latency=0.2).start(), StubBackend(latency=0.05).start()]
+        os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+        os.environ.setdefault("OPENROUTER_RPM", "6000")  # the stand-in has no rate limit
+        os.environ.setdefault("OPENROUTER_BURST", "100")
+        os.environ["OPENROUTER_URL"] = f"{stubs[0].base_url}/api/v1/chat/completions"
+        os.environ["BACKEND_API"] = f"{stubs[1].base_url}/api/crop/get-crop"
+
+    server = ChatServer(args.openrouter_concurrency, args.backend_concurrency, args.workers)
+    try:
+        web.run_app(server.app(), host=args.host, port=args.port)
+    finally:
+        for stub in stubs:
+            stub.stop()
@@ -1,20 +1,28 @@
 import os
+import sys
 import requests
 import json
 import re
+import time
+from requests.adapters import HTTPAdapter
 from langdetect import detect
 from dotenv import load_dotenv
 from typing import Optional
 from pydantic import BaseModel, Field
 
+# Shared OpenRouter rate limiter lives at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from openrouter_limiter import LIMITER, PRIORITY_CHAT, PRIORITY_EXTRACTION, RateLimitDropped
+from http_transport import configure_session
+
 # Load API Key securely from environment variable
 load_dotenv()
 API_KEY = os.getenv("OPENROUTER_API_KEY")
 if not API_KEY:
     raise ValueError("API Key missing! Set OPENROUTER_API_KEY in environment variables.")
 
-# OpenRouter API settings
-URL = "https://openrouter.ai/api/v1/chat/completions"
+# OpenRouter API settings (OPENROUTER_URL can point at a local stand-in)
+URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
 MODEL_NAME = "google/gemma-2-9b-it:free"
 
 # Validate model selection
@@ -22,6 +30,16 @@ VALID_MODELS = ["google/gemma-2-9b-it:free"]
 if MODEL_NAME not in VALID_MODELS:
     raise ValueError(f"Invalid model '{MODEL_NAME}'. Choose from {VALID_MODELS}")
 
+# Shared keep-alive session for all OpenRouter calls (saves a TLS handshake per turn)
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+configure_session(session)  # HTTP_TRANSPORT_MODE=record|replay, see http_transport.py
+
+# Timeouts in seconds: connecting, and waiting between bytes of a (streamed) response
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+
 # Tamil & English Mapping for Soil and Crops
 TAMIL_SOIL_MAP = {'சிவப்பு மண்': 'Red Soil', 'கருப்பு களிமண்': 'Black Clayey Soil', 'பழுப்பு மண்': 'Brown Soil', 'வண்டல் மண்': 'Alluvial Soil'}
 TAMIL_CROP_MAP = {'நெல்': 'Rice', 'கரும்பு': 'Sugarcane', 'நிலக்கடலை': 'Groundnut', 'பருத்தி': 'Cotton', 'வாழை': 'Banana'}
@@ -64,37 +82,184 @@ def determine_growth_stage(days_ago, crop_type):
     elif days_ago <= sum(stages): return "mid_season"
     else: return "late_season"
 
+CHAT_SYSTEM_MESSAGE = (
+    "You are a helpful farming assistant. You **only** talk about farming topics. "
+    "You give advice on crops, soil, irrigation, fertilizers, pests, and related agricultural topics. "
+    "You do NOT discuss politics, finance, entertainment, or unrelated topics. "
+    "Keep your responses friendly, helpful, and practical for farmers."
+)
+
+# Rough token count without a tokenizer (~4 bytes per token; Tamil letters take 3 bytes in UTF-8)
+def estimate_tokens(text):
+    return max(1, len(text.encode("utf-8")) // 4)
+
+# Conversation history kept within a token budget
+class ConversationHistory:
+    """
+    Chat history sent with every request, bounded by `token_budget` (estimated tokens).
+
+    The system prompt and the farm facts collected so far are always sent. The most
+    recent turns (at most `window_turns`) follow verbatim; older turns are folded into
+    a short running summary of what was asked and advised, which is itself trimmed to
+    `summary_budget`. No extra model call is made, so each turn costs about the same
+    however long the session runs.
+    """
+
+    def __init__(self, system_message=CHAT_SYSTEM_MESSAGE, token_budget=1500, window_turns=6, summary_budget=300):
+        self.system_message = system_message
+        self.token_budget = token_budget
+        self.window_turns = window_turns
+        self.summary_budget = summary_budget
+        self.facts = ""
+        self.turns = []          # recent (user, assistant) pairs
+        self.summary_lines = []  # one line per compacted turn
+        self.compacted_turns = 0
+
+    def update_facts(self, farming_data):
+        """Pin the extracted FarmingInfo so it survives compaction"""
+        known = [f"{label}: {value}" for label, value in (
+            ("Soil", farming_data.soil_type), ("Crop", farming_data.crop_type),
+            ("Planted", farming_data.planting_date), ("Growth stage", farming_data.growth_stage)) if value]
+        self.facts = ("Farm details given by the farmer: " + ", ".join(known) + ".") if known else ""
+
+    def add_turn(self, user_input, assistant_response):
+        self.turns.append((user_input, assistant_response))
+        while len(self.turns) > self.window_turns:
+            self._compact_oldest()
+
+    def _compact_oldest(self):
+        user_input, assistant_response = self.turns.pop(0)
+        advice = re.split(r"(?<=[.!?])\s", assistant_response.strip(), maxsplit=1)[0]
+        self.summary_lines.append(f"- Farmer asked: {user_input[:100]} | Advised: {advice[:160]}")
+        self.compacted_turns += 1
+        while len(self.summary_lines) > 1 and estimate_tokens("\n".join(self.summary_lines)) > self.summary_budget:
+            self.summary_lines.pop(0)
+
+    def _pinned(self):
+        messages = [{"role": "system", "content": self.system_message}]
+        if self.facts:
+            messages.append({"role": "system", "content": self.facts})
+        if self.summary_lines:
+            messages.append({"role": "system", "content": "Earlier in this conversation:\n" + "\n".join(self.summary_lines)})
+        return messages
+
+    def messages(self, user_input):
+        """Messages for the next request: pinned context, recent turns, then `user_input`"""
+        while True:
+            recent = []
+            for past_input, past_response in self.turns:
+                recent.append({"role": "user", "content": past_input})
+                recent.append({"role": "assistant", "content": past_response})
+            messages = self._pinned() + recent + [{"role": "user", "content": user_input}]
+            if not self.turns or sum(estimate_tokens(m["content"]) for m in messages) <= self.token_budget:
+                return messages
+            self._compact_oldest()
+
+# Read the text deltas from an OpenRouter server-sent event stream
+def iter_stream_tokens(response):
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or line.startswith(":"):
+            continue  # keep-alive comments such as ": OPENROUTER PROCESSING"
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        chunk = json.loads(data)
+        if "error" in chunk:
+            raise requests.RequestException(chunk["error"])
+        token = chunk["choices"][0].get("delta", {}).get("content")
+        if token:
+            yield token
+    raise requests.RequestException("stream ended before [DONE]")
+
 # Call OpenRouter API for normal chat responses
-def call_openrouter_api(user_input):
+def call_openrouter_api(user_input, on_token=None, stream=True, history=None):
     """
     Calls OpenRouter API and ensures chatty but farming-specific responses.
+
+    With a ConversationHistory the request carries its pinned facts, summary and
+    recent turns; otherwise only the system prompt and `user_input` are sent.
+
+    With stream=True the reply is requested as server-sent events and every text
+    fragment is passed to `on_token` as it arrives. If streaming fails before the first
+    token (or the server answers with plain JSON), the call falls back to a normal
+    request. Returns (response_text, timing), where timing has time_to_first_token_s,
+    total_s, streamed, payload_bytes and prompt_tokens (estimated).
     """
     headers = {
         "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json"
     }
 
-    system_message = (
-        "You are a helpful farming assistant. You **only** talk about farming topics. "
-        "You give advice on crops, soil, irrigation, fertilizers, pests, and related agricultural topics. "
-        "You do NOT discuss politics, finance, entertainment, or unrelated topics. "
-        "Keep your responses friendly, helpful, and practical for farmers."
-    )
+    if history:
+        messages = history.messages(user_input)
+    else:
+        messages = [
+            {"role": "system", "content": CHAT_SYSTEM_MESSAGE},
+            {"role": "user", "content": user_input}
+        ]
 
     payload = {
         "model": MODEL_NAME,
-        "messages": [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_input}
-        ],
+        "messages": messages,
         "temperature": 0.7  # Chatty but still informative
     }
 
-    response = requests.post(URL, headers=headers, json=payload)
-    response.raise_for_status()
+    started = time.perf_counter()
+    timing = {
+        "time_to_first_token_s": None,
+        "total_s": None,
+        "streamed": False,
+        "payload_bytes": len(json.dumps(payload).encode("utf-8")),
+        "prompt_tokens": sum(estimate_tokens(message["content"]) for message in messages)
+    }
+
+    if stream:
+        tokens = []
+        try:
+            LIMITER.acquire(PRIORITY_CHAT)
+            with session.post(URL, headers=headers, json=dict(payload, stream=True), stream=True,
+                              timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+                if response.status_code == 429:
+                    LIMITER.report_rate_limited(response.headers.get("Retry-After"))
+                response.raise_for_status()
+                if response.headers.get("Content-Type", "").startswith("text/event-stream"):
+                    for token in iter_stream_tokens(response):
+                        if not tokens:
+                            timing["time_to_first_token_s"] = round(time.perf_counter() - started, 3)
+                        tokens.append(token)
+                        if on_token:
+                            on_token(token)
+                    timing["streamed"] = True
+                else:
+                    # Server ignored stream=true and sent the whole completion
+                    response_text = response.json()["choices"][0]["message"]["content"]
+                    timing["time_to_first_token_s"] = timing["total_s"] = round(time.perf_counter() - started, 3)
+                    return response_text, timing
+        except (requests.RequestException, ValueError, KeyError) as e:
+            if tokens:
+                # Part of the answer is already on screen: keep it rather than asking again
+                print(f"\n⚠️ Response interrupted: {e}")
+                timing["streamed"] = True
+            elif getattr(getattr(e, 'response', None), 'status_code', None) == 429:
+                # The limiter is paused for Retry-After: the plain request below waits it out
+                print("⚠️ Rate limited, retrying without streaming once the pause ends")
+            else:
+                print(f"⚠️ Streaming failed ({e}), retrying without streaming")
+        if tokens:
+            timing["total_s"] = round(time.perf_counter() - started, 3)
+            return "".join(tokens), timing
+
+    def post():
+        response = session.post(URL, headers=headers, json=payload, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        response.raise_for_status()
+        return response
 
+    response = LIMITER.call(post, PRIORITY_CHAT)
     response_text = response.json()["choices"][0]["message"]["content"]
-    return response_text
+    timing["time_to_first_token_s"] = timing["total_s"] = round(time.perf_counter() - started, 3)
+    return response_text, timing
 
 # Call OpenRouter API for **structured** JSON data extraction
 def extract_farming_info(conversation_text):
@@ -123,10 +288,17 @@ def extract_farming_info(conversation_text):
         "temperature": 0.1  # Low temperature for accuracy
     }
 
-    response = requests.post(URL, headers=headers, json=payload, timeout=10)  # Reduce delay
-    response.raise_for_status()
+    def post():
+        response = session.post(URL, headers=headers, json=payload, timeout=10)  # Reduce delay
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
 
-    response_text = response.json()["choices"][0]["message"]["content"]
+    # Identical extraction requests already in flight share one upstream call
+    try:
+        response_text = LIMITER.call(post, PRIORITY_EXTRACTION, key=json.dumps(payload, sort_keys=True))
+    except RateLimitDropped as e:
+        print(f"⚠️ Extraction skipped: {e}")
+        return FarmingInfo()
 
     extracted_data = extract_json(response_text)
 
@@ -145,7 +317,7 @@ def chat():
     print("🌾 Welcome to the Farmer Assistant! (Supports Tamil & English)")
     print("Type 'quit' to exit. Type 'json' to see collected data.\n")
 
-    conversation_history = []
+    history = ConversationHistory()
     farming_data = FarmingInfo()  # Initialize empty farming data
 
     while True:
@@ -181,20 +353,26 @@ def chat():
             farming_data.growth_stage = extracted_info.growth_stage
             updated = True
 
-        # Let AI generate a response even when JSON is extracted
-        ai_response = call_openrouter_api(user_input)
-
         # If new farming data was extracted, summarize the info & continue chat
         if updated:
             print("🤖 Got it! I’ve noted down your farming details.")
             print(f"🌱 Soil: {farming_data.soil_type}, Crop: {farming_data.crop_type}, Planted: {farming_data.planting_date}\n")
-        
-        # Always respond chattily
-        print("🤖", ai_response)
 
-        # Save chat history
-        conversation_history.append({"role": "user", "content": user_input})
-        conversation_history.append({"role": "assistant", "content": ai_response})
+        # Let AI generate a response even when JSON is extracted, printing it as it streams in
+        print("🤖 ", end="", flush=True)
+        history.update_facts(farming_data)
+        try:
+            ai_response, timing = call_openrouter_api(user_input, on_token=lambda token: print(token, end="", flush=True), history=history)
+        except RateLimitDropped:
+            print("\n⚠️ The assistant is busy right now, please ask again in a moment.")
+            continue
+        if not timing["streamed"]:
+            print(ai_response, end="")
+        print(f"\n   (first token {timing['time_to_first_token_s']}s, total {timing['total_s']}s, "
+              f"request {timing['payload_bytes']} bytes / ~{timing['prompt_tokens']} tokens)")
+
+        # Save chat history (older turns are compacted to stay within the token budget)
+        history.add_turn(user_input, ai_response)
 
 # Run Chatbot
 if __name__ == "__main__":
@@ -1,8 +1,18 @@
 import math
 import csv
+import json
 import os
+import sqlite3
+import functools
+import threading
 import requests
+import numpy as np
 from datetime import datetime, timedelta
+from types import MappingProxyType
+from weather_ingest import daily_weather_series, fetch_forecast
+from result_cache import TwoTierCache, cache_key
+from water_metrics import InMemorySink, increment, log, set_metrics_sink, span
+from http_transport import configure_session
 
 # ================== LOAD CSV DATA ==================
 def load_csv_data(file_path):
@@ -109,6 +119,174 @@ def load_location_constants(csv_path):
         }
     }
 
+# ================== PROPERTY REGISTRY ==================
+GROWTH_STAGES = ('initial', 'development', 'mid_season', 'late_season')
+
+class _Profile:
+    """Immutable, slot-based record that also supports dict-style access (profile['field'])"""
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            value = fields[name]
+            if isinstance(value, dict):
+                value = MappingProxyType(value)
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+    def __reduce__(self):
+        # Pickle as plain dicts (mappingproxy itself is not picklable), e.g. for process pools
+        fields = {name: dict(getattr(self, name)) if isinstance(getattr(self, name), MappingProxyType) else getattr(self, name)
+                  for name in self.__slots__}
+        return (_rebuild_profile, (type(self), fields))
+
+def _rebuild_profile(cls, fields):
+    return cls(**fields)
+
+class SoilProfile(_Profile):
+    __slots__ = ('name', 'water_holding_capacity', 'field_capacity', 'wilting_point', 'infiltration_rate',
+                 'bulk_density', 'texture', 'available_water_per_mm_root')
+
+class CropProfile(_Profile):
+    __slots__ = ('name', 'kc_values', 'growth_stages', 'root_depth', 'critical_depletion',
+                 'water_sensitivity', 'typical_yield', 'growing_seasons', 'total_days')
+
+class CropCalendar(_Profile):
+    """
+    Day-indexed season arrays for one crop: stage index into GROWTH_STAGES, Kc, root
+    depth (m), critical depletion, and max available water (mm) for each soil type.
+    """
+    __slots__ = ('name', 'total_days', 'stage_index', 'kc', 'root_depth', 'critical_depletion', 'available_water_max')
+
+def compile_crop_calendar(crop, soils):
+    """Expand a crop's stage table into per-day arrays covering its whole season"""
+    durations = [crop['growth_stages'][stage] for stage in GROWTH_STAGES]
+    stage_index = np.repeat(np.arange(len(GROWTH_STAGES), dtype=np.int8), durations)
+    root_depth = np.array([crop['root_depth'][stage] for stage in GROWTH_STAGES])[stage_index]
+    arrays = {
+        'stage_index': stage_index,
+        'kc': np.array([crop['kc_values'][stage] for stage in GROWTH_STAGES])[stage_index],
+        'root_depth': root_depth,
+        'critical_depletion': np.array([crop['critical_depletion'][stage] for stage in GROWTH_STAGES])[stage_index],
+    }
+    water_max = {name: soil['available_water_per_mm_root'] * root_depth*1000 for name, soil in soils.items()}
+    for values in list(arrays.values()) + list(water_max.values()):
+        values.flags.writeable = False
+    return CropCalendar(name=crop['name'], total_days=len(stage_index), available_water_max=water_max, **arrays)
+
+class PropertyRegistry:
+    """
+    Process-wide cache of soil and crop profiles.
+
+    The CSV files are parsed once into immutable SoilProfile/CropProfile objects and
+    only re-read when a file's modification time changes.
+    """
+
+    def __init__(self, soil_csv='soil_properties.csv', crop_csv='crop_properties.csv'):
+        self.soil_csv = soil_csv
+        self.crop_csv = crop_csv
+        self._lock = threading.Lock()
+        self._soils = None
+        self._crops = None
+        self._soil_mtime = None
+        self._crop_mtime = None
+        self._calendars = None
+        self._calendar_version = None
+
+    @property
+    def version(self):
+        """Modification times of the loaded files; changes whenever the profiles are reloaded"""
+        self.soils()
+        self.crops()
+        return (self._soil_mtime, self._crop_mtime)
+
+    def soils(self):
+        """Return {soil_type: SoilProfile}, reloading if soil_properties.csv changed"""
+        mtime = os.stat(self.soil_csv).st_mtime_ns
+        if mtime != self._soil_mtime:
+            with self._lock:
+                if mtime != self._soil_mtime:
+                    self._soils = MappingProxyType({
+                        name: SoilProfile(
+                            name=name,
+                            available_water_per_mm_root=(props['field_capacity'] - props['wilting_point'])/100,
+                            **props
+                        )
+                        for name, props in load_soil_properties(self.soil_csv).items()
+                    })
+                    self._soil_mtime = mtime
+        return self._soils
+
+    def crops(self):
+        """Return {crop: CropProfile}, reloading if crop_properties.csv changed"""
+        mtime = os.stat(self.crop_csv).st_mtime_ns
+        if mtime != self._crop_mtime:
+            with self._lock:
+                if mtime != self._crop_mtime:
+                    self._crops = MappingProxyType({
+                        name: CropProfile(
+                            name=name,
+                            total_days=sum(props['growth_stages'].values()),
+                            **dict(props, growing_seasons=tuple(props['growing_seasons']))
+                        )
+                        for name, props in load_crop_properties(self.crop_csv).items()
+                    })
+                    self._crop_mtime = mtime
+        return self._crops
+
+    def calendars(self):
+        """Return {crop: CropCalendar}, recompiled whenever either CSV file is reloaded"""
+        soils, crops = self.soils(), self.crops()
+        version = (self._soil_mtime, self._crop_mtime)
+        if version != self._calendar_version:
+            with self._lock:
+                self._calendars = MappingProxyType({name: compile_crop_calendar(crop, soils) for name, crop in crops.items()})
+                self._calendar_version = version
+        return self._calendars
+
+    def calendar_for(self, crop):
+        """
+        CropCalendar of a CropProfile. A profile from the current load is served from the
+        compiled calendars without re-checking the CSV files; any other profile is compiled.
+        """
+        calendars, crops = self._calendars, self._crops
+        if calendars is None or self._calendar_version != (self._soil_mtime, self._crop_mtime) or crops.get(crop.name) is not crop:
+            calendars, crops = self.calendars(), self._crops
+            if crops.get(crop.name) is not crop:
+                return compile_crop_calendar(crop, self.soils())
+        return calendars[crop.name]
+
+    def snapshot(self):
+        """Picklable copy of the loaded profiles, so worker processes can skip the CSV parsing"""
+        return {
+            'soils': dict(self.soils()),
+            'crops': dict(self.crops()),
+            'calendars': dict(self.calendars()),
+            'version': (self._soil_mtime, self._crop_mtime)
+        }
+
+    def restore(self, snapshot):
+        """Install profiles from snapshot(); they stay in use until a CSV file's mtime changes"""
+        with self._lock:
+            self._soils = MappingProxyType(snapshot['soils'])
+            self._crops = MappingProxyType(snapshot['crops'])
+            self._calendars = MappingProxyType(snapshot['calendars'])
+            self._soil_mtime, self._crop_mtime = snapshot['version']
+            self._calendar_version = snapshot['version']
+
+PROPERTY_REGISTRY = PropertyRegistry()
+
 # ================== FARMER-FRIENDLY GUIDANCE ==================
 def get_water_depth_guidance(crop_type, growth_stage):
     """
@@ -163,33 +341,31 @@ def determine_current_growth_stage(crop_properties, crop_name, days_since_planti
     Determine the current growth stage based on days since planting
     """
     try:
-        crop = crop_properties[crop_name]
-        stages = list(crop['growth_stages'].items())
-        
-        cumulative_days = 0
-        for stage, duration in stages:
-            cumulative_days += duration
-            if days_since_planting < cumulative_days:
-                return stage
-        
-        # If beyond all stages, return late_season
-        return "late_season"
+        # Days past the last stage resolve to late_season
+        return get_growth_stage(crop_properties[crop_name], days_since_planting)
     except:
         # Default to initial if there's any error
         return "initial"
 
 # ================== BACKEND API CONNECTION ==================
-def get_latest_prediction_data(base_url="https://ba7f-103-238-230-194.ngrok-free.app"):
-    """Fetch latest prediction data from the backend API"""
+BACKEND_BASE_URL = "https://ba7f-103-238-230-194.ngrok-free.app"
+
+# Default session for backend calls; HTTP_TRANSPORT_MODE=record|replay hooks it (see http_transport.py)
+HTTP_SESSION = configure_session(requests.Session())
+BACKEND_TIMEOUT = 10  # seconds; a stalled backend must not hang the worker's poller or job thread
+
+def get_latest_prediction_data(base_url=BACKEND_BASE_URL, session=None):
+    """Fetch latest prediction data from the backend API (through `session` to reuse connections)"""
     endpoint = f"{base_url}/api/crop/latest-prediction"
     
     try:
-        print(f"Fetching data from API: {endpoint}")
-        response = requests.get(endpoint)
+        log(f"Fetching data from API: {endpoint}")
+        with span('network', endpoint='latest-prediction'):
+            response = (session or HTTP_SESSION).get(endpoint, timeout=BACKEND_TIMEOUT)
+        increment('network_requests', endpoint='latest-prediction')
         if response.status_code == 200:
             data = response.json()
-            print(f"Successfully fetched data from API: {endpoint}")
-            print(f"API response: {data}")
+            log(f"Fetched prediction data ({len(response.content)} bytes)")
             return data
         else:
             print(f"Error fetching prediction data: {response.status_code}")
@@ -199,13 +375,36 @@ def get_latest_prediction_data(base_url="https://ba7f-103-238-230-194.ngrok-free
         print(f"Exception when fetching prediction data: {e}")
         return None
 
-def format_prediction_data_for_calculations(prediction_data):
-    """Format the prediction data for water requirement calculations"""
+def fetch_forecast_for_prediction(prediction_data, api_key=None, session=None):
+    """
+    Raw OpenWeather forecast for a prediction record's location, or None when no
+    OPENWEATHER_API_KEY is configured or the request fails (the backend's aggregate
+    weather is used then)
+    """
+    api_key = api_key or os.getenv("OPENWEATHER_API_KEY")
+    if not api_key or not prediction_data:
+        return None
+    try:
+        with span('network', endpoint='forecast'):
+            payload = fetch_forecast(prediction_data.get('latitude', DEFAULT_LOCATION['latitude']),
+                                     prediction_data.get('longitude', DEFAULT_LOCATION['longitude']),
+                                     api_key, session=session)
+        increment('network_requests', endpoint='forecast')
+        return payload
+    except Exception as e:
+        print(f"Forecast unavailable, using the backend's weather: {e}")
+        return None
+
+def format_prediction_data_for_calculations(prediction_data, forecast_payload=None):
+    """
+    Format the prediction data for water requirement calculations
+
+    If a raw OpenWeather 3-hourly `forecast_payload` is given, weather_data holds its full
+    daily series instead of the single five-day aggregate from the backend.
+    """
     if not prediction_data:
         return None, None, None, None, None
     
-    print(f"Formatting prediction data: {prediction_data}")
-    
     # Extract location data
     location = {
         'latitude': prediction_data.get('latitude', 9.2088),
@@ -214,14 +413,18 @@ def format_prediction_data_for_calculations(prediction_data):
     }
     
     # Extract weather data
-    weather_data = [{
-        'date': datetime.now().strftime("%Y-%m-%d"),
-        'temp_min': prediction_data.get('min_temp', 22),
-        'temp_max': prediction_data.get('max_temp', 36),
-        'humidity': prediction_data.get('avg_relative_humidity', 60),
-        'wind_speed': prediction_data.get('avg_wind_speed', 2.0),
-        'rainfall': prediction_data.get('total_rainfall', 0)
-    }]
+    with span('weather_prep', source='forecast' if forecast_payload else 'prediction'):
+        if forecast_payload:
+            weather_data = daily_weather_series(forecast_payload)
+        else:
+            weather_data = [{
+                'date': datetime.now().strftime("%Y-%m-%d"),
+                'temp_min': prediction_data.get('min_temp', 22),
+                'temp_max': prediction_data.get('max_temp', 36),
+                'humidity': prediction_data.get('avg_relative_humidity', 60),
+                'wind_speed': prediction_data.get('avg_wind_speed', 2.0),
+                'rainfall': prediction_data.get('total_rainfall', 0)
+            }]
     
     # Extract crop and soil information
     crop_type = prediction_data.get('crop_type')
@@ -239,14 +442,80 @@ def format_prediction_data_for_calculations(prediction_data):
     else:
         plantation_date = datetime.now().strftime("%Y-%m-%d")
     
-    print(f"Formatted data: location={location}, crop={crop_type}, soil={soil_type}, date={plantation_date}")
+    log(f"Formatted data: location={location}, crop={crop_type}, soil={soil_type}, date={plantation_date}")
     
     return location, weather_data, crop_type, soil_type, plantation_date
 
 # ================== CALCULATION FUNCTIONS ==================
+# Default location (Krishnan Kovil region) and per-day weather used when no forecast is available
+DEFAULT_LOCATION = {
+    'latitude': 9.2088,
+    'longitude': 77.2561,
+    'elevation': 150
+}
+
+DEFAULT_WEATHER = {
+    'temp_min': 22,
+    'temp_max': 36,
+    'wind_speed': 2.0,
+    'rh_min': 45,
+    'rh_max': 75
+}
+
+class RadiationTable(_Profile):
+    """
+    Weather-independent Penman-Monteith terms for one (latitude, elevation) cell: the
+    psychrometric constant and, indexed by day of year (0-366), extraterrestrial (Ra)
+    and clear-sky (Rso) radiation.
+    """
+    __slots__ = ('name', 'latitude', 'elevation', 'gamma', 'ra', 'rso', 'ra_values', 'rso_values')
+
+def _radiation_row(lat, elevation, doy):
+    """Ra and Rso (MJ/m2/day) for one day of year"""
+    lat_rad = math.radians(lat)
+
+    # Solar calculations; the sunset hour angle is clipped for polar day (pi) and polar night (0)
+    dr = 1 + 0.033 * math.cos(2 * math.pi * doy / 365)
+    delta_rad = 0.409 * math.sin(2 * math.pi * doy / 365 - 1.39)
+    ws = math.acos(min(max(-math.tan(lat_rad) * math.tan(delta_rad), -1.0), 1.0))
+
+    # Radiation components
+    Ra = (24*60/math.pi) * 0.0820 * dr * (
+        ws * math.sin(lat_rad) * math.sin(delta_rad) +
+        math.cos(lat_rad) * math.cos(delta_rad) * math.sin(ws)
+    )
+    Rso = (0.75 + 2e-5 * elevation) * Ra
+    return Ra, Rso
+
+def _psychrometric_constant(elevation):
+    """Atmospheric pressure based psychrometric constant gamma (kPa/°C)"""
+    P = 101.3 * ((293 - 0.0065 * elevation)/293)**5.26
+    return 0.665e-3 * P
+
+@functools.lru_cache(maxsize=256)
+def radiation_table(lat, elevation):
+    """Cached RadiationTable for a location; least recently used cells are evicted past maxsize"""
+    rows = [_radiation_row(lat, elevation, doy) for doy in range(367)]
+    ra_values = tuple(row[0] for row in rows)
+    rso_values = tuple(row[1] for row in rows)
+    ra = np.array(ra_values)
+    rso = np.array(rso_values)
+    ra.flags.writeable = False
+    rso.flags.writeable = False
+    return RadiationTable(name=(lat, elevation), latitude=lat, elevation=elevation,
+                          gamma=_psychrometric_constant(elevation),
+                          ra=ra, rso=rso, ra_values=ra_values, rso_values=rso_values)
+
+def radiation_terms(lat, elevation, doy):
+    """(Ra, Rso, gamma) for a location and day, read from the cached radiation table"""
+    if 0 <= doy <= 366 and doy == int(doy):
+        table = radiation_table(lat, elevation)
+        doy = int(doy)
+        return table.ra_values[doy], table.rso_values[doy], table.gamma
+    return _radiation_row(lat, elevation, doy) + (_psychrometric_constant(elevation),)
+
 def calculate_eto(tmin, tmax, elevation, lat, doy, wind_speed=2.0, rh_min=45, rh_max=75):
     """FAO Penman-Monteith equation implementation"""
-    lat_rad = math.radians(lat)
     tmean = (tmax + tmin) / 2
 
     # Saturation vapor pressure
@@ -257,27 +526,92 @@ def calculate_eto(tmin, tmax, elevation, lat, doy, wind_speed=2.0, rh_min=45, rh
     # Actual vapor pressure
     ea = (es_tmin * (rh_max/100) + es_tmax * (rh_min/100)) / 2
 
-    # Atmospheric parameters
+    # Atmospheric parameters and radiation depend only on location and day of year
     delta = 4098 * es / ((tmean + 237.3)**2)
-    P = 101.3 * ((293 - 0.0065 * elevation)/293)**5.26
-    gamma = 0.665e-3 * P
+    Ra, Rso, gamma = radiation_terms(lat, elevation, doy)
+    Rs = Ra * 0.5  # Estimated solar radiation
 
-    # Solar calculations
-    dr = 1 + 0.033 * math.cos(2 * math.pi * doy / 365)
-    delta_rad = 0.409 * math.sin(2 * math.pi * doy / 365 - 1.39)
-    ws = math.acos(-math.tan(lat_rad) * math.tan(delta_rad))
+    # Net radiation
+    Rns = (1 - 0.23) * Rs
+    # Rs/Rso is a fixed ratio of the two coefficients; in polar night both are 0, so use that ratio directly
+    Rs_Rso = Rs / Rso if Rso else 0.5 / (0.75 + 2e-5 * elevation)
+    Rnl = 4.903e-9 * ((tmax + 273.16)**4 + (tmin + 273.16)**4)/2 * (0.34 - 0.14 * math.sqrt(ea)) * (1.35 * Rs_Rso - 0.35)
+    Rn = Rns - Rnl
 
-    # Radiation components
-    Ra = (24*60/math.pi) * 0.0820 * dr * (
-        ws * math.sin(lat_rad) * math.sin(delta_rad) +
-        math.cos(lat_rad) * math.cos(delta_rad) * math.sin(ws)
-    )
-    Rso = (0.75 + 2e-5 * elevation) * Ra
+    # Final ETo calculation
+    numerator = 0.408 * delta * Rn + gamma * (900/(tmean + 273)) * wind_speed * (es - ea)
+    denominator = delta + gamma * (1 + 0.34 * wind_speed)
+    eto = numerator / denominator
+
+    return max(eto, 0)
+
+def radiation_terms_batch(lat, elevation, doy):
+    """
+    Vectorized radiation_terms: broadcasts lat/elevation/doy and returns (Ra, Rso, gamma)
+    arrays gathered from one cached RadiationTable per distinct (lat, elevation) cell.
+    """
+    lat, elevation = np.broadcast_arrays(np.asarray(lat, dtype=np.float64), np.asarray(elevation, dtype=np.float64))
+    doy = np.asarray(doy, dtype=np.float64)
+    if doy.size and (doy.min() < 0 or doy.max() > 366 or not np.all(doy == np.floor(doy))):
+        # Fractional or out-of-range days are computed directly instead of read from the tables
+        lat_rad = np.radians(lat)
+
+        # Solar calculations
+        dr = 1 + 0.033 * np.cos(2 * np.pi * doy / 365)
+        delta_rad = 0.409 * np.sin(2 * np.pi * doy / 365 - 1.39)
+        ws = np.arccos(np.clip(-np.tan(lat_rad) * np.tan(delta_rad), -1.0, 1.0))
+
+        # Radiation components
+        Ra = (24*60/np.pi) * 0.0820 * dr * (
+            ws * np.sin(lat_rad) * np.sin(delta_rad) +
+            np.cos(lat_rad) * np.cos(delta_rad) * np.sin(ws)
+        )
+        Rso = (0.75 + 2e-5 * elevation) * Ra
+        P = 101.3 * ((293 - 0.0065 * elevation)/293)**5.26
+        return Ra, Rso, 0.665e-3 * P
+    cells, cell_index = np.unique(np.stack([lat.ravel(), elevation.ravel()], axis=1), axis=0, return_inverse=True)
+    tables = [radiation_table(float(cell_lat), float(cell_elevation)) for cell_lat, cell_elevation in cells]
+    cell_index = cell_index.reshape(lat.shape)
+    day_index = doy.astype(np.int64)
+    Ra = np.stack([table.ra for table in tables])[cell_index, day_index]
+    Rso = np.stack([table.rso for table in tables])[cell_index, day_index]
+    gamma = np.array([table.gamma for table in tables])[cell_index]
+    return Ra, Rso, gamma
+
+def calculate_eto_batch(tmin, tmax, elevation, lat, doy, wind_speed=2.0, rh_min=45, rh_max=75):
+    """
+    Vectorized FAO Penman-Monteith over NumPy arrays.
+
+    Takes the same inputs as calculate_eto, but every argument may be a scalar or an
+    array; inputs are broadcast together and one ETo value (mm/day) is returned per
+    element. Results match calculate_eto element by element.
+    """
+    tmin = np.asarray(tmin, dtype=np.float64)
+    tmax = np.asarray(tmax, dtype=np.float64)
+    wind_speed = np.asarray(wind_speed, dtype=np.float64)
+    rh_min = np.asarray(rh_min, dtype=np.float64)
+    rh_max = np.asarray(rh_max, dtype=np.float64)
+    tmean = (tmax + tmin) / 2
+
+    # Saturation vapor pressure
+    es_tmin = 0.6108 * np.exp(17.27 * tmin / (tmin + 237.3))
+    es_tmax = 0.6108 * np.exp(17.27 * tmax / (tmax + 237.3))
+    es = (es_tmin + es_tmax) / 2
+
+    # Actual vapor pressure
+    ea = (es_tmin * (rh_max/100) + es_tmax * (rh_min/100)) / 2
+
+    # Atmospheric parameters and radiation depend only on location and day of year
+    delta = 4098 * es / ((tmean + 237.3)**2)
+    Ra, Rso, gamma = radiation_terms_batch(lat, elevation, doy)
     Rs = Ra * 0.5  # Estimated solar radiation
 
     # Net radiation
     Rns = (1 - 0.23) * Rs
-    Rnl = 4.903e-9 * ((tmax + 273.16)**4 + (tmin + 273.16)**4)/2 * (0.34 - 0.14 * math.sqrt(ea)) * (1.35 * Rs/Rso - 0.35)
+    # Rs/Rso is a fixed ratio of the two coefficients; in polar night both are 0, so use that ratio directly
+    Rs_Rso = np.divide(Rs, Rso, out=np.broadcast_to(0.5 / (0.75 + 2e-5 * np.asarray(elevation, dtype=np.float64)), Rso.shape).copy(),
+                       where=Rso != 0)
+    Rnl = 4.903e-9 * ((tmax + 273.16)**4 + (tmin + 273.16)**4)/2 * (0.34 - 0.14 * np.sqrt(ea)) * (1.35 * Rs_Rso - 0.35)
     Rn = Rns - Rnl
 
     # Final ETo calculation
@@ -285,10 +619,14 @@ def calculate_eto(tmin, tmax, elevation, lat, doy, wind_speed=2.0, rh_min=45, rh
     denominator = delta + gamma * (1 + 0.34 * wind_speed)
     eto = numerator / denominator
 
-    return max(eto, 0)
+    return np.maximum(eto, 0)
 
 def get_growth_stage(crop, day):
     """Determine current growth stage for given day"""
+    if isinstance(crop, CropProfile):
+        # O(1) lookup in the compiled calendar's day table; days past the season stay in the last stage
+        calendar = PROPERTY_REGISTRY.calendar_for(crop)
+        return GROWTH_STAGES[calendar.stage_index[min(max(day, 0), calendar.total_days - 1)]]
     stages = list(crop['growth_stages'].items())
     cumulative = 0
     for stage, duration in stages:
@@ -297,32 +635,258 @@ def get_growth_stage(crop, day):
             return stage
     return stages[-1][0]
 
-def calculate_crop_water(crop_name, soil_type, planting_date, weather_data=None, location=None):
-    """Main calculation function for crop water requirements in liters per hectare"""
-    print(f"Starting water calculation for {crop_name} in {soil_type} soil, planted on {planting_date}")
+def day_of_year_series(start_dates, days):
+    """Day of year for `days` consecutive dates from each start date, as a (len(start_dates), days) array"""
+    dates = np.array([d.date() if isinstance(d, datetime) else d for d in start_dates], dtype='datetime64[D]')[:, None] + np.arange(days)
+    return (dates - dates.astype('datetime64[Y]')).astype(np.int64) + 1
+
+def season_weather_arrays(weather_data, days):
+    """Per-day tmin, tmax, wind speed, RH min and RH max arrays: forecast days first, defaults after"""
+    tmin = np.full(days, float(DEFAULT_WEATHER['temp_min']))
+    tmax = np.full(days, float(DEFAULT_WEATHER['temp_max']))
+    wind_speed = np.full(days, DEFAULT_WEATHER['wind_speed'])
+    rh_min = np.full(days, float(DEFAULT_WEATHER['rh_min']))
+    rh_max = np.full(days, float(DEFAULT_WEATHER['rh_max']))
+    for day, day_weather in enumerate((weather_data or [])[:days]):
+        if not day_weather:
+            continue
+        tmin[day] = day_weather.get('temp_min', DEFAULT_WEATHER['temp_min'])
+        tmax[day] = day_weather.get('temp_max', DEFAULT_WEATHER['temp_max'])
+        wind_speed[day] = day_weather.get('wind_speed', DEFAULT_WEATHER['wind_speed'])
+        # Estimate relative humidity min/max from average humidity
+        humidity = day_weather.get('humidity', 60)
+        rh_min[day] = max(humidity - 15, 30)
+        rh_max[day] = min(humidity + 15, 90)
+    return tmin, tmax, wind_speed, rh_min, rh_max
+
+def schedule_irrigation_events(etc, calendar, soil_type, start_day=0, end_day=None, current_storage=None):
+    """
+    Event-jump version of the daily soil-moisture balance.
+
+    Uses the cumulative ETc of the season to binary-search, stage by stage, for the
+    first day on which depletion exceeds the stage's critical depletion, so the cost is
+    O((events + stages) * log days) instead of O(days). Simulates season days
+    start_day..end_day-1 (the whole season by default) starting from `current_storage`
+    mm (field capacity by default). Returns (event_days, irrigation amounts in mm, total
+    ETc in mm over the range, soil storage in mm at the end of the range).
+    """
+    end_day = len(etc) if end_day is None else end_day
+    if start_day >= end_day:
+        return [], [], 0.0, current_storage
+    water_max = calendar.available_water_max[soil_type]
+    critical_depletion = calendar.critical_depletion
+    cumulative = np.cumsum(etc[start_day:end_day])  # cumulative[i] is the ETc through day start_day + i
+    stage_starts = [d for d in (np.flatnonzero(np.diff(calendar.stage_index)) + 1).tolist() if start_day < d < end_day]
+
+    event_days = []
+    amounts = []
+    day = start_day
+    consumed = 0.0  # cumulative ETc at the last reset
+    reset_storage = float(water_max[start_day]) if current_storage is None else current_storage
+    for start, end in zip([start_day] + stage_starts, stage_starts + [end_day]):
+        day = max(day, start)
+        # Irrigation is triggered once storage drops below this level (storage is reset to field capacity)
+        trigger_storage = water_max[start] * (1 - critical_depletion[start])
+        while day < end:
+            target = consumed + reset_storage - trigger_storage
+            trigger = day + int(np.searchsorted(cumulative[day - start_day:end - start_day], target, side='right'))
+            if trigger >= end:
+                break
+            current_storage = reset_storage - (cumulative[trigger - start_day] - consumed)
+            event_days.append(trigger)
+            amounts.append(float(water_max[trigger] - current_storage))
+            consumed = cumulative[trigger - start_day]
+            reset_storage = float(water_max[trigger])
+            day = trigger + 1
+
+    return event_days, amounts, float(cumulative[-1]), float(reset_storage - (cumulative[-1] - consumed))
+
+SCHEDULE_DTYPE = np.dtype([
+    ('day_num', np.int16),
+    ('date', 'datetime64[D]'),
+    ('amount_mm', np.float32),
+    ('amount_liters_per_ha', np.float32),
+    ('stage_code', np.int8)
+])
+SCHEDULE_CSV_FIELDS = ['field', 'day_num', 'date', 'amount_mm', 'amount_liters_per_ha', 'stage']
+
+class IrrigationSchedule:
+    """
+    Columnar irrigation schedule of one field.
+
+    Events are kept as parallel arrays: season day offsets (int16), amounts in mm and
+    L/ha (float32, already rounded to 0.1 mm / 1 L) and growth stage codes (int8, index
+    into GROWTH_STAGES). Indexing, iteration and to_list() produce the familiar entries
+    {'day_num', 'date', 'amount_mm', 'amount_liters_per_ha', 'stage'} on demand; pass
+    json_default to json.dump(s) to serialize results that contain a schedule.
+    """
+    __slots__ = ('start_date', 'day_offsets', 'amount_mm', 'amount_liters_per_ha', 'stage_codes')
+
+    def __init__(self, start_date, day_offsets=(), amount_mm=(), amount_liters_per_ha=(), stage_codes=()):
+        self.start_date = start_date
+        self.day_offsets = np.asarray(day_offsets, dtype=np.int16)
+        self.amount_mm = np.asarray(amount_mm, dtype=np.float32)
+        self.amount_liters_per_ha = np.asarray(amount_liters_per_ha, dtype=np.float32)
+        self.stage_codes = np.asarray(stage_codes, dtype=np.int8)
+
+    @classmethod
+    def from_events(cls, start_date, days, irrigation_needed, stage_index):
+        """Schedule for irrigations of `irrigation_needed` mm on season days `days` (0-based)"""
+        irrigation_needed = [float(amount) for amount in irrigation_needed]
+        return cls(
+            start_date,
+            days,
+            [round(amount, 1) for amount in irrigation_needed],
+            [round(amount * 10000, 0) for amount in irrigation_needed],  # Convert mm to L/ha
+            np.asarray(stage_index)[np.asarray(days, dtype=np.int64)] if len(days) else ()
+        )
+
+    @classmethod
+    def from_list(cls, start_date, entries):
+        """Rebuild a schedule from list-of-dicts entries (e.g. read back from JSON)"""
+        return cls(
+            start_date,
+            [entry['day_num'] - 1 for entry in entries],
+            [entry['amount_mm'] for entry in entries],
+            [entry['amount_liters_per_ha'] for entry in entries],
+            [GROWTH_STAGES.index(entry['stage']) for entry in entries]
+        )
+
+    def __len__(self):
+        return len(self.day_offsets)
+
+    def __add__(self, other):
+        return IrrigationSchedule(
+            self.start_date,
+            np.concatenate([self.day_offsets, other.day_offsets]),
+            np.concatenate([self.amount_mm, other.amount_mm]),
+            np.concatenate([self.amount_liters_per_ha, other.amount_liters_per_ha]),
+            np.concatenate([self.stage_codes, other.stage_codes])
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.to_list()[index]
+        day = int(self.day_offsets[index])
+        return {
+            'day_num': day + 1,
+            'date': (self.start_date + timedelta(days=day)).strftime("%Y-%m-%d"),
+            'amount_mm': round(float(self.amount_mm[index]), 1),
+            'amount_liters_per_ha': float(self.amount_liters_per_ha[index]),
+            'stage': GROWTH_STAGES[self.stage_codes[index]]
+        }
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __eq__(self, other):
+        if isinstance(other, IrrigationSchedule):
+            return self.to_list() == other.to_list()
+        return self.to_list() == other
+
+    def __repr__(self):
+        return f"IrrigationSchedule({len(self)} events from {self.start_date:%Y-%m-%d})"
+
+    @property
+    def dates(self):
+        """Event dates as a datetime64[D] array"""
+        return np.datetime64(self.start_date.date(), 'D') + self.day_offsets.astype('timedelta64[D]')
+
+    def to_list(self):
+        """Entries in the list-of-dicts shape sent to the backend and stored as JSON"""
+        return [
+            {'day_num': day + 1, 'date': date, 'amount_mm': amount_mm, 'amount_liters_per_ha': liters, 'stage': GROWTH_STAGES[stage]}
+            for day, date, amount_mm, liters, stage in zip(
+                self.day_offsets.tolist(),
+                self.dates.astype(str).tolist(),
+                np.round(self.amount_mm.astype(np.float64), 1).tolist(),
+                self.amount_liters_per_ha.astype(np.float64).tolist(),
+                self.stage_codes.tolist()
+            )
+        ]
+
+    def to_numpy(self):
+        """Events as one structured array (day_num, date, amount_mm, amount_liters_per_ha, stage_code)"""
+        events = np.empty(len(self), dtype=SCHEDULE_DTYPE)
+        events['day_num'] = self.day_offsets + 1
+        events['date'] = self.dates
+        events['amount_mm'] = self.amount_mm
+        events['amount_liters_per_ha'] = self.amount_liters_per_ha
+        events['stage_code'] = self.stage_codes
+        return events
+
+def json_default(obj):
+    """json.dump(s) `default` hook that serializes IrrigationSchedule as its list of entries"""
+    if isinstance(obj, IrrigationSchedule):
+        return obj.to_list()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def export_schedules_csv(path, schedules):
+    """
+    Write many schedules to one CSV file. `schedules` maps a field id to its
+    IrrigationSchedule (or is a list, in which case the field id is the position).
+    """
+    if not isinstance(schedules, dict):
+        schedules = dict(enumerate(schedules))
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(SCHEDULE_CSV_FIELDS)
+        for field, schedule in schedules.items():
+            if schedule is None:
+                continue
+            for entry in schedule.to_list():
+                writer.writerow([field, entry['day_num'], entry['date'], entry['amount_mm'],
+                                 int(entry['amount_liters_per_ha']), entry['stage']])
+
+def summarize_water_result(total_water, total_days, irrigation_schedule):
+    """Build the calculate_crop_water result dict from season totals (mm) and the schedule"""
+    # Calculate water in different units
+    total_water_mm = round(total_water, 1)
+    total_water_liters_per_ha = round(total_water * 10000, 0)  # 1 mm over 1 ha = 10,000 liters
+    
+    # Convert to liters per acre
+    hectare_to_acre = 2.47105
+    total_water_liters_per_acre = round(total_water_liters_per_ha / hectare_to_acre)
+    daily_avg_liters_per_acre = round((total_water / total_days) * 10000 / hectare_to_acre)
+
+    return {
+        'total_water_mm': total_water_mm,
+        'total_water_liters_per_ha': total_water_liters_per_ha,
+        'total_water_liters_per_acre': total_water_liters_per_acre,
+        'irrigation_count': len(irrigation_schedule),
+        'daily_avg_mm': round(total_water / total_days, 1),
+        'daily_avg_liters_per_ha': round((total_water / total_days) * 10000, 0),
+        'daily_avg_liters_per_acre': daily_avg_liters_per_acre,
+        'schedule': irrigation_schedule
+    }
+
+def calculate_crop_water(crop_name, soil_type, planting_date, weather_data=None, location=None, scheduler='daily'):
+    """
+    Main calculation function for crop water requirements in liters per hectare
+
+    scheduler='daily' steps the soil-moisture balance one day at a time; scheduler='event'
+    computes the season's ETc up front and jumps between irrigation events with
+    schedule_irrigation_events, giving the same result.
+    """
+    log(f"Starting water calculation for {crop_name} in {soil_type} soil, planted on {planting_date}")
     
     # Load data from CSV files
-    try:
-        soil_properties = load_soil_properties('soil_properties.csv')
-        print(f"Loaded soil properties for: {list(soil_properties.keys())}")
-    except Exception as e:
-        print(f"Error loading soil properties: {e}")
-        return None
-        
-    try:
-        crop_properties = load_crop_properties('crop_properties.csv')
-        print(f"Loaded crop properties for: {list(crop_properties.keys())}")
-    except Exception as e:
-        print(f"Error loading crop properties: {e}")
-        return None
+    with span('load'):
+        try:
+            soil_properties = PROPERTY_REGISTRY.soils()
+        except Exception as e:
+            print(f"Error loading soil properties: {e}")
+            return None
+
+        try:
+            crop_properties = PROPERTY_REGISTRY.crops()
+        except Exception as e:
+            print(f"Error loading crop properties: {e}")
+            return None
     
     # Use provided location or default to Krishnan Kovil region
     if not location:
-        location = {
-            'latitude': 9.2088,
-            'longitude': 77.2561,
-            'elevation': 150
-        }
+        location = DEFAULT_LOCATION
     
     # Default temperature and rainfall patterns for Krishnan Kovil
     temperature_defaults = {
@@ -361,113 +925,464 @@ def calculate_crop_water(crop_name, soil_type, planting_date, weather_data=None,
             return None
 
     try:
-        current_date = datetime.strptime(planting_date, "%Y-%m-%d")
-        total_days = sum(crop['growth_stages'].values())
-        print(f"Calculating for {total_days} days from {planting_date}")
-
-        # Initialize soil moisture storage (mm)
-        root_depth = crop['root_depth']['initial']
-        available_water_max = (soil['field_capacity'] - soil['wilting_point'])/100 * root_depth*1000
-        current_storage = available_water_max  # Start at field capacity
-
-        irrigation_schedule = []
-        total_water = 0
-
-        for day in range(total_days):
-            # Update growth parameters
-            stage = get_growth_stage(crop, day)
-            kc = crop['kc_values'][stage]
-            root_depth = crop['root_depth'][stage]
-            critical_depletion = crop['critical_depletion'][stage]
-
-            # Recalculate max available water for current root depth
-            available_water_max = (soil['field_capacity'] - soil['wilting_point'])/100 * root_depth*1000
-
-            # Get weather data for this day
-            # If available in forecast data, use it; otherwise, use default values
-            if weather_data and day < len(weather_data):
-                day_weather = weather_data[day]
-                tmin = day_weather.get('temp_min', temperature_defaults['annual_min'])
-                tmax = day_weather.get('temp_max', temperature_defaults['annual_max'])
-                wind_speed = day_weather.get('wind_speed', 2.0)
-                humidity = day_weather.get('humidity', 60)
-                # Estimate relative humidity min/max from average humidity
-                rh_min = max(humidity - 15, 30)
-                rh_max = min(humidity + 15, 90)
-            else:
-                # Default to temperature defaults
-                tmin = temperature_defaults['annual_min']
-                tmax = temperature_defaults['annual_max']
-                wind_speed = 2.0
-                rh_min = 45
-                rh_max = 75
-
-            # Calculate ET components
-            doy = current_date.timetuple().tm_yday
-            eto = calculate_eto(
-                tmin=tmin,
-                tmax=tmax,
-                elevation=location['elevation'],
-                lat=location['latitude'],
-                doy=doy,
-                wind_speed=wind_speed,
-                rh_min=rh_min,
-                rh_max=rh_max
-            )
-            etc = eto * kc
-
-            # Update soil moisture
-            current_storage -= etc
-
-            # Calculate depletion percentage
-            depletion = 1 - (current_storage / available_water_max)
-
-            # Check irrigation need
-            if depletion > critical_depletion:
-                irrigation_needed = available_water_max - current_storage
-                irrigation_schedule.append({
-                    'day_num': day+1,
-                    'date': current_date.strftime("%Y-%m-%d"),
-                    'amount_mm': round(irrigation_needed, 1),
-                    'amount_liters_per_ha': round(irrigation_needed * 10000, 0),  # Convert mm to L/ha
-                    'stage': stage
-                })
-                # Reset soil moisture after irrigation
-                current_storage = available_water_max
-
-            total_water += etc
-            current_date += timedelta(days=1)
-
-        # Calculate water in different units
-        total_water_mm = round(total_water, 1)
-        total_water_liters_per_ha = round(total_water * 10000, 0)  # 1 mm over 1 ha = 10,000 liters
-        
-        # Convert to liters per acre
-        hectare_to_acre = 2.47105
-        total_water_liters_per_acre = round(total_water_liters_per_ha / hectare_to_acre)
-        daily_avg_liters_per_acre = round((total_water / total_days) * 10000 / hectare_to_acre)
-        
-        print(f"Calculation completed: {total_water_liters_per_ha} L/ha ({total_water_liters_per_acre} L/acre), {len(irrigation_schedule)} irrigation events")
+        start_date = datetime.strptime(planting_date, "%Y-%m-%d")
+        total_days = crop.total_days
+        log(f"Calculating for {total_days} days from {planting_date}")
 
-        return {
-            'total_water_mm': total_water_mm,
-            'total_water_liters_per_ha': total_water_liters_per_ha,
-            'total_water_liters_per_acre': total_water_liters_per_acre,
-            'irrigation_count': len(irrigation_schedule),
-            'daily_avg_mm': round(total_water / total_days, 1),
-            'daily_avg_liters_per_ha': round((total_water / total_days) * 10000, 0),
-            'daily_avg_liters_per_acre': daily_avg_liters_per_acre,
-            'schedule': irrigation_schedule
-        }
+        # Per-day growth parameters come from the precompiled crop calendar
+        calendar = PROPERTY_REGISTRY.calendars()[crop_name]
+
+        # Dated forecast records go on their own season days (undated ones keep their position)
+        if weather_data:
+            weather_data = align_weather_to_season(weather_data, start_date, total_days)
+
+        if scheduler == 'event':
+            # Whole-season ETc in one vectorized call, then jump from one irrigation event to the next
+            with span('weather_prep', scheduler=scheduler):
+                tmin, tmax, wind_speed, rh_min, rh_max = season_weather_arrays(weather_data, total_days)
+            with span('simulate', scheduler=scheduler):
+                eto = calculate_eto_batch(tmin, tmax, location['elevation'], location['latitude'],
+                                          day_of_year_series([start_date], total_days)[0], wind_speed, rh_min, rh_max)
+                event_days, amounts, total_water, _ = schedule_irrigation_events(eto * calendar.kc, calendar, soil_type)
+            with span('serialize', scheduler=scheduler):
+                irrigation_schedule = IrrigationSchedule.from_events(start_date, event_days, amounts, calendar.stage_index)
+        else:
+            # No instrumentation inside the day loop: one span around it, counters after it
+            with span('simulate', scheduler=scheduler):
+                kc_values = calendar.kc.tolist()
+                depletion_values = calendar.critical_depletion.tolist()
+                water_max_values = calendar.available_water_max[soil_type].tolist()
+                doys = day_of_year_series([start_date], total_days)[0].tolist()
+                forecast_days = len(weather_data) if weather_data else 0
+
+                # Initialize soil moisture storage (mm)
+                current_storage = water_max_values[0]  # Start at field capacity
+
+                event_days = []
+                amounts = []
+                total_water = 0
+
+                for day in range(total_days):
+                    # Update growth parameters (max available water follows the current root depth)
+                    kc = kc_values[day]
+                    critical_depletion = depletion_values[day]
+                    available_water_max = water_max_values[day]
+
+                    # Get weather data for this day
+                    # If available in forecast data, use it; otherwise, use default values
+                    if day < forecast_days and weather_data[day]:
+                        day_weather = weather_data[day]
+                        tmin = day_weather.get('temp_min', temperature_defaults['annual_min'])
+                        tmax = day_weather.get('temp_max', temperature_defaults['annual_max'])
+                        wind_speed = day_weather.get('wind_speed', 2.0)
+                        humidity = day_weather.get('humidity', 60)
+                        # Estimate relative humidity min/max from average humidity
+                        rh_min = max(humidity - 15, 30)
+                        rh_max = min(humidity + 15, 90)
+                    else:
+                        # Default to temperature defaults
+                        tmin = temperature_defaults['annual_min']
+                        tmax = temperature_defaults['annual_max']
+                        wind_speed = 2.0
+                        rh_min = 45
+                        rh_max = 75
+
+                    # Calculate ET components
+                    eto = calculate_eto(
+                        tmin=tmin,
+                        tmax=tmax,
+                        elevation=location['elevation'],
+                        lat=location['latitude'],
+                        doy=doys[day],
+                        wind_speed=wind_speed,
+                        rh_min=rh_min,
+                        rh_max=rh_max
+                    )
+                    etc = eto * kc
+
+                    # Update soil moisture
+                    current_storage -= etc
+
+                    # Calculate depletion percentage
+                    depletion = 1 - (current_storage / available_water_max)
+
+                    # Check irrigation need
+                    if depletion > critical_depletion:
+                        irrigation_needed = available_water_max - current_storage
+                        event_days.append(day)
+                        amounts.append(irrigation_needed)
+                        # Reset soil moisture after irrigation
+                        current_storage = available_water_max
+
+                    total_water += etc
+
+                irrigation_schedule = IrrigationSchedule.from_events(start_date, event_days, amounts, calendar.stage_index)
+
+        with span('serialize'):
+            result = summarize_water_result(total_water, total_days, irrigation_schedule)
+        increment('simulated_days', total_days)
+        increment('irrigation_events', len(irrigation_schedule))
+        log(f"Calculation completed: {result['total_water_liters_per_ha']} L/ha ({result['total_water_liters_per_acre']} L/acre), {len(irrigation_schedule)} irrigation events")
+
+        return result
     except Exception as e:
         print(f"Error in calculate_crop_water: {e}")
         import traceback
         traceback.print_exc()
         return None
 
+def step_water_balance(etc, available_water_max, critical_depletion, active=None):
+    """
+    Step many soil-moisture balances forward together, one day at a time.
+
+    All arguments are (rows, days) arrays; `active` masks days outside a row's season.
+    Every row starts at field capacity. Returns (total ETc per row, events), where
+    events is a list of (day, rows irrigated that day, irrigation amounts in mm).
+    """
+    current_storage = available_water_max[:, 0].copy()  # Start at field capacity
+    total_water = np.zeros(len(etc))
+    events = []
+    for day in range(etc.shape[1]):
+        current_storage -= etc[:, day]
+        depletion = 1 - (current_storage / available_water_max[:, day])
+        needs_water = depletion > critical_depletion[:, day]
+        if active is not None:
+            needs_water &= active[:, day]
+        if needs_water.any():
+            rows = np.nonzero(needs_water)[0]
+            events.append((day, rows, available_water_max[rows, day] - current_storage[rows]))
+            current_storage[rows] = available_water_max[rows, day]
+        total_water += etc[:, day]
+    return total_water, events
+
+def calculate_crop_water_batch(fields, include_peak_demand=False, eto_raster=None):
+    """
+    Batch version of calculate_crop_water for many fields at once.
+
+    `fields` is a list of dicts with the calculate_crop_water arguments (crop_name,
+    soil_type, planting_date and optional weather_data/location). ETo for every field
+    and day is computed in one vectorized call, then all soil-moisture balances are
+    stepped forward together one day at a time. Returns a list of result dicts (or
+    None for fields that could not be set up), in the same order as `fields`. With
+    include_peak_demand, each result also has 'peak_daily_mm', the highest daily ETc.
+    With an eto_raster (regional_eto.EToRaster), fields without their own weather_data
+    whose location, elevation and season the raster covers read their ETo from it instead.
+    """
+    try:
+        with span('load'):
+            soil_properties = PROPERTY_REGISTRY.soils()
+            calendars = PROPERTY_REGISTRY.calendars()
+    except Exception as e:
+        print(f"Error loading crop/soil properties: {e}")
+        return [None] * len(fields)
+
+    results = [None] * len(fields)
+    setups = []
+    for i, field in enumerate(fields):
+        crop_name = field.get('crop_name')
+        if crop_name not in calendars:
+            print(f"Warning: Crop '{crop_name}' not found in database. Using Rice as default.")
+            crop_name = "Rice"
+        soil_type = field.get('soil_type')
+        if soil_type not in soil_properties:
+            print(f"Warning: Soil type '{soil_type}' not found in database. Using Red Soil as default.")
+            soil_type = "Red Soil"
+        try:
+            start_date = datetime.strptime(field['planting_date'], "%Y-%m-%d")
+            calendar = calendars[crop_name]
+            soil_properties[soil_type]
+        except Exception as e:
+            print(f"Error setting up field {i}: {e}")
+            continue
+        setups.append((i, calendar, soil_type, start_date, field.get('weather_data'), field.get('location') or DEFAULT_LOCATION))
+
+    if not setups:
+        return results
+
+    n = len(setups)
+    max_days = max(calendar.total_days for _, calendar, _, _, _, _ in setups)
+
+    with span('weather_prep', fields=n):
+        # Per-field, per-day inputs (padded to the longest season, masked by `active`)
+        active = np.zeros((n, max_days), dtype=bool)
+        kc = np.zeros((n, max_days))
+        critical_depletion = np.zeros((n, max_days))
+        available_water_max = np.ones((n, max_days))
+        stage_index = np.zeros((n, max_days), dtype=np.int8)
+        tmin, tmax, wind_speed, rh_min, rh_max = (np.empty((n, max_days)) for _ in range(5))
+        elevation = np.empty((n, 1))
+        lat = np.empty((n, 1))
+        season_days = np.empty(n, dtype=np.int64)
+
+        for row, (_, calendar, soil_type, start_date, weather_data, location) in enumerate(setups):
+            days = calendar.total_days
+            kc[row, :days] = calendar.kc
+            critical_depletion[row, :days] = calendar.critical_depletion
+            available_water_max[row, :days] = calendar.available_water_max[soil_type]
+            stage_index[row, :days] = calendar.stage_index
+            season_days[row] = days
+            active[row, :days] = True
+
+            if weather_data:
+                weather_data = align_weather_to_season(weather_data, start_date, max_days)
+            tmin[row], tmax[row], wind_speed[row], rh_min[row], rh_max[row] = season_weather_arrays(weather_data, max_days)
+
+            elevation[row, 0] = location['elevation']
+            lat[row, 0] = location['latitude']
+
+    with span('simulate', fields=n):
+        # Day of year for every simulated date
+        doy = day_of_year_series([setup[3] for setup in setups], max_days)
+
+        if eto_raster is None:
+            eto = calculate_eto_batch(tmin, tmax, elevation, lat, doy, wind_speed, rh_min, rh_max)
+        else:
+            # District fields share the raster's per-day grid computation; the rest are computed here
+            eto = np.zeros((n, max_days))
+            computed = []
+            for row, (_, _, _, start_date, weather_data, location) in enumerate(setups):
+                days = season_days[row]
+                if weather_data is None and eto_raster.covers(location, start_date, days):
+                    eto[row, :days] = eto_raster.eto_series(location['latitude'], location['longitude'], start_date, days)
+                else:
+                    computed.append(row)
+            if computed:
+                eto[computed] = calculate_eto_batch(tmin[computed], tmax[computed], elevation[computed], lat[computed],
+                                                    doy[computed], wind_speed[computed], rh_min[computed], rh_max[computed])
+        etc = np.where(active, eto * kc, 0.0)
+
+        total_water, events = step_water_balance(etc, available_water_max, critical_depletion, active)
+
+    with span('serialize', fields=n):
+        # Flatten the per-day events, group them by field (stable sort keeps each field's days in order)
+        if events:
+            event_rows = np.concatenate([rows for _, rows, _ in events])
+            event_days = np.concatenate([np.full(len(rows), day) for day, rows, _ in events])
+            event_amounts = np.concatenate([amounts for _, _, amounts in events])
+        else:
+            event_rows = event_days = np.zeros(0, dtype=np.int64)
+            event_amounts = np.zeros(0)
+        order = np.argsort(event_rows, kind='stable')
+        bounds = np.searchsorted(event_rows[order], np.arange(n + 1))
+        event_days, event_amounts = event_days[order], event_amounts[order]
+
+        for row, setup in enumerate(setups):
+            first, last = bounds[row], bounds[row + 1]
+            schedule = IrrigationSchedule.from_events(setup[3], event_days[first:last], event_amounts[first:last], stage_index[row])
+            results[setup[0]] = summarize_water_result(float(total_water[row]), int(season_days[row]), schedule)
+            if include_peak_demand:
+                results[setup[0]]['peak_daily_mm'] = round(float(etc[row].max()), 2)
+
+    increment('fields', n)
+    increment('simulated_days', int(season_days.sum()))
+    increment('irrigation_events', sum(len(rows) for _, rows, _ in events))
+    log(f"Batch calculation completed for {n} of {len(fields)} fields over up to {max_days} days")
+    return results
+
+# ================== RESULT CACHE ==================
+RESULT_CACHE_PATH = 'water_results.sqlite'
+RESULT_CACHE_VERSION = 2     # bump when the calculation or the key changes, to retire old entries
+
+def _encode_water_result(result):
+    return json.dumps({'start_date': result['schedule'].start_date.strftime("%Y-%m-%d"), 'result': result}, default=json_default)
+
+def _decode_water_result(text):
+    entry = json.loads(text)
+    result = entry['result']
+    result['schedule'] = IrrigationSchedule.from_list(datetime.strptime(entry['start_date'], "%Y-%m-%d"), result['schedule'])
+    return result
+
+def create_result_cache(path=RESULT_CACHE_PATH, max_memory_items=4096, max_disk_items=200000, ttl=7 * 24 * 3600):
+    """Two-tier (memory LRU + SQLite at `path`, or memory only with path=None) cache for water results"""
+    return TwoTierCache(path, max_memory_items, max_disk_items, ttl, dumps=_encode_water_result, loads=_decode_water_result)
+
+# Process-wide memory-only cache used when no cache is passed in
+RESULT_CACHE = create_result_cache(path=None)
+
+def canonical_water_inputs(weather_data=None, location=None):
+    """
+    The location and weather values the calculation reads, with defaults filled in and
+    everything else (longitude, rainfall, extra keys) dropped, for building cache keys.
+    Values are not rounded, so equal keys always mean equal results.
+    """
+    location = location or DEFAULT_LOCATION
+    canonical_location = {
+        'latitude': float(location['latitude']),
+        'elevation': float(location['elevation'])
+    }
+    canonical_weather = [
+        {
+            'temp_min': float(day_weather.get('temp_min', DEFAULT_WEATHER['temp_min'])),
+            'temp_max': float(day_weather.get('temp_max', DEFAULT_WEATHER['temp_max'])),
+            'wind_speed': float(day_weather.get('wind_speed', DEFAULT_WEATHER['wind_speed'])),
+            'humidity': float(day_weather.get('humidity', 60)),
+            'date': day_weather.get('date')
+        }
+        for day_weather in ((day_weather or {}) for day_weather in (weather_data or []))
+    ]
+    return canonical_weather, canonical_location
+
+def calculate_crop_water_cached(crop_name, soil_type, planting_date, weather_data=None, location=None, cache=None):
+    """
+    calculate_crop_water through a result cache (RESULT_CACHE by default).
+
+    The key hashes crop, soil, planting date, the canonical location and forecast values
+    and the property file versions; misses are calculated from the caller's own inputs,
+    so results are always identical to calculate_crop_water.
+    """
+    cache = cache or RESULT_CACHE
+    canonical_weather, canonical_location = canonical_water_inputs(weather_data, location)
+    key = cache_key(RESULT_CACHE_VERSION, crop_name, soil_type, planting_date, canonical_location, canonical_weather,
+                    list(PROPERTY_REGISTRY.version))
+    result = cache.get_or_compute(key, lambda: calculate_crop_water(crop_name, soil_type, planting_date, weather_data, location))
+    # Callers add keys (e.g. input_data) to the result, so hand out a copy of the cached dict
+    return dict(result) if result else result
+
+# ================== INCREMENTAL SEASON STATE ==================
+SEASON_STATE_PATH = 'season_state.sqlite'
+
+class SeasonStateStore:
+    """
+    Per-field season state persisted in a SQLite table, one row per field.
+
+    Each entry records how far the field's season has been simulated (day and date),
+    the soil moisture at that point, the ETc so far and the irrigation events already
+    committed, so later runs only need to advance the days that have passed since.
+    put() writes only that field's row, so updating many fields stays linear.
+    """
+
+    def __init__(self, path=SEASON_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connection(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS season_state (key TEXT PRIMARY KEY, state TEXT NOT NULL)")
+            self._db.commit()
+        return self._db
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection().execute("SELECT state FROM season_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, state):
+        with self._lock:
+            db = self._connection()
+            db.execute("INSERT OR REPLACE INTO season_state (key, state) VALUES (?, ?)", (key, json.dumps(state)))
+            db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+def season_field_key(crop_name, soil_type, planting_date, location):
+    """Identify a field's season by crop, soil, planting date and location"""
+    return f"{crop_name}|{soil_type}|{planting_date}|{float(location['latitude']):.4f}|{float(location['longitude']):.4f}"
+
+def align_weather_to_season(weather_data, start_date, total_days):
+    """
+    Place weather records on season days by their 'date' (records without a date keep
+    their list position; None entries are skipped). Days without a record are None,
+    i.e. use the defaults.
+    """
+    aligned = [None] * total_days
+    for index, record in enumerate(weather_data or []):
+        if not record:
+            continue
+        day = (datetime.strptime(record['date'], "%Y-%m-%d") - start_date).days if record.get('date') else index
+        if 0 <= day < total_days:
+            aligned[day] = record
+    return aligned
+
+def calculate_crop_water_incremental(crop_name, soil_type, planting_date, weather_data=None, location=None,
+                                     state_store=None, as_of=None):
+    """
+    calculate_crop_water that resumes from persisted season state.
+
+    Days before `as_of` (today by default) are simulated once and committed to
+    `state_store`; later runs advance only the days that have passed since. The rest of
+    the season is projected from the current soil moisture with the freshest forecast,
+    which is matched to season days by date. Returns the same structure as
+    calculate_crop_water.
+    """
+    try:
+        soil_properties = PROPERTY_REGISTRY.soils()
+        calendars = PROPERTY_REGISTRY.calendars()
+        if crop_name not in calendars:
+            print(f"Warning: Crop '{crop_name}' not found in database. Using Rice as default.")
+            crop_name = "Rice"
+        if soil_type not in soil_properties:
+            print(f"Warning: Soil type '{soil_type}' not found in database. Using Red Soil as default.")
+            soil_type = "Red Soil"
+        calendar = calendars[crop_name]
+        location = location or DEFAULT_LOCATION
+        start_date = datetime.strptime(planting_date, "%Y-%m-%d")
+        total_days = calendar.total_days
+        as_of = as_of or datetime.now()
+        observed_days = min(max((as_of.date() - start_date.date()).days, 0), total_days)
+
+        key = season_field_key(crop_name, soil_type, planting_date, location)
+        version = list(PROPERTY_REGISTRY.version)
+        state = state_store.get(key) if state_store else None
+        if not state or state['properties_version'] != version or state['day'] > observed_days:
+            # No usable state (new field, changed property files or a rewound clock): start at field capacity
+            state = {'day': 0, 'current_storage': None, 'total_water': 0.0, 'schedule': []}
+        first_day = state['day']
+        committed = IrrigationSchedule.from_list(start_date, state['schedule'])
+
+        # ETc for every day not yet committed, with the fresh forecast placed on its dates
+        remaining_days = total_days - first_day
+        weather = align_weather_to_season(weather_data, start_date, total_days)[first_day:]
+        tmin, tmax, wind_speed, rh_min, rh_max = season_weather_arrays(weather, remaining_days)
+        doy = day_of_year_series([start_date + timedelta(days=first_day)], remaining_days)[0]
+        etc = np.zeros(total_days)
+        etc[first_day:] = calculate_eto_batch(tmin, tmax, location['elevation'], location['latitude'],
+                                              doy, wind_speed, rh_min, rh_max) * calendar.kc[first_day:]
+
+        # Commit the days that have passed since the last run
+        event_days, amounts, committed_water, current_storage = schedule_irrigation_events(
+            etc, calendar, soil_type, first_day, observed_days, state['current_storage'])
+        schedule = committed + IrrigationSchedule.from_events(start_date, event_days, amounts, calendar.stage_index)
+        total_water = state['total_water'] + committed_water
+        if state_store:
+            state_store.put(key, {
+                'day': observed_days,
+                'last_simulated_date': (start_date + timedelta(days=observed_days - 1)).strftime("%Y-%m-%d") if observed_days else None,
+                'current_storage': current_storage,
+                'total_water': total_water,
+                'schedule': schedule.to_list(),
+                'properties_version': version
+            })
+
+        # Project the rest of the season from the current soil moisture
+        event_days, amounts, projected_water, _ = schedule_irrigation_events(
+            etc, calendar, soil_type, observed_days, total_days, current_storage)
+        schedule = schedule + IrrigationSchedule.from_events(start_date, event_days, amounts, calendar.stage_index)
+
+        increment('simulated_days', total_days - first_day)
+        increment('irrigation_events', len(schedule) - len(committed))
+        log(f"Advanced {crop_name} season from day {first_day} to {observed_days} of {total_days}")
+        return summarize_water_result(total_water + projected_water, total_days, schedule)
+    except Exception as e:
+        print(f"Error in calculate_crop_water_incremental: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
 # ================== MAIN FUNCTION ==================
-def get_crop_water_requirements():
-    """Get crop water requirements using real-time data from backend API"""
+def get_crop_water_requirements(state_store=None):
+    """
+    Get crop water requirements using real-time data from backend API
+
+    With a SeasonStateStore, the season resumes from the stored state instead of being
+    simulated from the planting date on every run.
+    """
     
     # Fetch latest prediction data from the backend
     prediction_data = get_latest_prediction_data()
@@ -476,23 +1391,54 @@ def get_crop_water_requirements():
         print("Error: Could not fetch prediction data from API")
         return None
     
+    return calculate_water_for_prediction(prediction_data, state_store=state_store,
+                                          forecast_payload=fetch_forecast_for_prediction(prediction_data))
+
+def calculate_water_for_prediction(prediction_data, state_store=None, result_cache=None, forecast_payload=None):
+    """
+    Calculate water requirements for one backend prediction record
+
+    With a SeasonStateStore the season is advanced incrementally; otherwise, with a
+    result cache (see create_result_cache), identical requests reuse earlier results.
+    A raw OpenWeather `forecast_payload` replaces the backend's aggregate weather.
+    """
     # Format the data for calculations
-    location, weather_data, crop_type, soil_type, plantation_date = format_prediction_data_for_calculations(prediction_data)
+    location, weather_data, crop_type, soil_type, plantation_date = format_prediction_data_for_calculations(
+        prediction_data, forecast_payload)
     
     if not crop_type or not soil_type or not plantation_date:
         print("Error: Missing required data from prediction API")
         return None
     
-    print(f"Processing calculation for crop: {crop_type}, soil: {soil_type}, planting date: {plantation_date}")
+    log(f"Processing calculation for crop: {crop_type}, soil: {soil_type}, planting date: {plantation_date}")
     
     # Calculate water requirements
-    result = calculate_crop_water(
-        crop_name=crop_type,
-        soil_type=soil_type,
-        planting_date=plantation_date,
-        weather_data=weather_data,
-        location=location
-    )
+    if state_store:
+        result = calculate_crop_water_incremental(
+            crop_name=crop_type,
+            soil_type=soil_type,
+            planting_date=plantation_date,
+            weather_data=weather_data,
+            location=location,
+            state_store=state_store
+        )
+    elif result_cache:
+        result = calculate_crop_water_cached(
+            crop_name=crop_type,
+            soil_type=soil_type,
+            planting_date=plantation_date,
+            weather_data=weather_data,
+            location=location,
+            cache=result_cache
+        )
+    else:
+        result = calculate_crop_water(
+            crop_name=crop_type,
+            soil_type=soil_type,
+            planting_date=plantation_date,
+            weather_data=weather_data,
+            location=location
+        )
     
     if result:
         # Add original prediction data to the result
@@ -500,76 +1446,84 @@ def get_crop_water_requirements():
     
     return result
 
-def send_water_calculation_to_backend(calculation_result, base_url="https://ba7f-103-238-230-194.ngrok-free.app"):
-    """Send water calculation result to backend API for storage"""
+def build_backend_payload(calculation_result):
+    """Build the /api/crop/store-prediction payload from a calculation result with input_data"""
+    # Get next water date from first irrigation event in schedule
+    next_water_date = None
+    water_frequency = 0
+    
+    if calculation_result['irrigation_count'] > 0 and len(calculation_result['schedule']) > 0:
+        next_water_date = calculation_result['schedule'][0]['date']
+        
+        # Calculate average frequency between irrigation events
+        if len(calculation_result['schedule']) > 1:
+            intervals = np.diff(calculation_result['schedule'].day_offsets.astype(np.int64))
+            water_frequency = round(int(intervals.sum()) / len(intervals))
+        else:
+            water_frequency = 7  # Default to weekly if only one irrigation event
+    
+    # Calculate days since planting
+    planting_date = calculation_result['input_data']['plantation_date']
+    try:
+        plant_date = datetime.fromisoformat(planting_date.replace('Z', '+00:00'))
+        days_since_planting = (datetime.now() - plant_date).days
+    except:
+        days_since_planting = 5  # Default if date parsing fails
+    
+    # Determine current growth stage
+    try:
+        crop_properties = PROPERTY_REGISTRY.crops()
+        current_stage = determine_current_growth_stage(
+            crop_properties, 
+            calculation_result['input_data']['crop_type'],
+            days_since_planting
+        )
+    except:
+        current_stage = "initial"  # Default to initial stage if there's an error
+    
+    # Get water guidance for farmer
+    water_guidance = get_water_depth_guidance(
+        calculation_result['input_data']['crop_type'], 
+        current_stage
+    )
+    
+    # Convert to liters per acre
+    hectare_to_acre = 2.47105
+    liters_per_acre = round(calculation_result['total_water_liters_per_ha'] / hectare_to_acre)
+    
+    # Create simple instruction
+    simple_instruction = f"Water your {calculation_result['input_data']['crop_type']} every {water_frequency} days. {water_guidance}."
+    
+    # Prepare the data for sending as required by the API
+    payload = {
+        'water_predicted': calculation_result['total_water_liters_per_ha'],
+        'water_predicted_acre': liters_per_acre,
+        'next_water_date': next_water_date,
+        'water_frequency': water_frequency,
+        #'water_guidance': water_guidance,
+        'simple_instruction': simple_instruction
+    }
+    
+    return payload
+
+def send_water_calculation_to_backend(calculation_result, base_url=BACKEND_BASE_URL, session=None):
+    """Send water calculation result to backend API for storage (through `session` to reuse connections)"""
     # Use the correct endpoint for storing calculations
     endpoint = f"{base_url}/api/crop/store-prediction"
     
     try:
-        # Get next water date from first irrigation event in schedule
-        next_water_date = None
-        water_frequency = 0
-        
-        if calculation_result['irrigation_count'] > 0 and len(calculation_result['schedule']) > 0:
-            next_water_date = calculation_result['schedule'][0]['date']
-            
-            # Calculate average frequency between irrigation events
-            if len(calculation_result['schedule']) > 1:
-                dates = [datetime.strptime(irr['date'], "%Y-%m-%d") for irr in calculation_result['schedule']]
-                intervals = [(dates[i+1] - dates[i]).days for i in range(len(dates)-1)]
-                water_frequency = round(sum(intervals) / len(intervals))
-            else:
-                water_frequency = 7  # Default to weekly if only one irrigation event
-        
-        # Calculate days since planting
-        planting_date = calculation_result['input_data']['plantation_date']
-        try:
-            plant_date = datetime.fromisoformat(planting_date.replace('Z', '+00:00'))
-            days_since_planting = (datetime.now() - plant_date).days
-        except:
-            days_since_planting = 5  # Default if date parsing fails
-        
-        # Determine current growth stage
-        try:
-            crop_properties = load_crop_properties('crop_properties.csv')
-            current_stage = determine_current_growth_stage(
-                crop_properties, 
-                calculation_result['input_data']['crop_type'],
-                days_since_planting
-            )
-        except:
-            current_stage = "initial"  # Default to initial stage if there's an error
-        
-        # Get water guidance for farmer
-        water_guidance = get_water_depth_guidance(
-            calculation_result['input_data']['crop_type'], 
-            current_stage
-        )
-        
-        # Convert to liters per acre
-        hectare_to_acre = 2.47105
-        liters_per_acre = round(calculation_result['total_water_liters_per_ha'] / hectare_to_acre)
-        
-        # Create simple instruction
-        simple_instruction = f"Water your {calculation_result['input_data']['crop_type']} every {water_frequency} days. {water_guidance}."
-        
-        # Prepare the data for sending as required by the API
-        payload = {
-            'water_predicted': calculation_result['total_water_liters_per_ha'],
-            'water_predicted_acre': liters_per_acre,
-            'next_water_date': next_water_date,
-            'water_frequency': water_frequency,
-            #'water_guidance': water_guidance,
-            'simple_instruction': simple_instruction
-        }
+        with span('serialize', target='backend_payload'):
+            payload = build_backend_payload(calculation_result)
         
-        print(f"Sending calculation to backend: {payload}")
+        log(f"Sending calculation to backend: {endpoint}")
         
         # Send POST request to backend
-        response = requests.post(endpoint, json=payload)
+        with span('network', endpoint='store-prediction'):
+            response = (session or HTTP_SESSION).post(endpoint, json=payload, timeout=BACKEND_TIMEOUT)
+        increment('network_requests', endpoint='store-prediction')
         
         if response.status_code == 200 or response.status_code == 201:
-            print("Water calculation successfully sent to backend")
+            log("Water calculation successfully sent to backend")
             return True
         else:
             print(f"Error sending calculation to backend: {response.status_code}")
@@ -583,12 +1537,14 @@ def send_water_calculation_to_backend(calculation_result, base_url="https://ba7f
 
 # ================== EXECUTE MAIN CODE ==================
 if __name__ == "__main__":
+    metrics = InMemorySink()
+    set_metrics_sink(metrics)
     try:
         print("========== CROP WATER CALCULATOR ==========")
         print(f"Starting execution at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         
         # Get water requirements
-        result = get_crop_water_requirements()
+        result = get_crop_water_requirements(state_store=SeasonStateStore())
         
         if result:
             # Print the results
@@ -613,7 +1569,7 @@ if __name__ == "__main__":
                 
                 # Get current growth stage and guidance
                 try:
-                    crop_properties = load_crop_properties('crop_properties.csv')
+                    crop_properties = PROPERTY_REGISTRY.crops()
                     current_stage = determine_current_growth_stage(
                         crop_properties, 
                         input_data['crop_type'],
@@ -638,4 +1594,5 @@ if __name__ == "__main__":
         import traceback
         traceback.print_exc()
     
+    log(f"Metrics: {json.dumps(metrics.summary())}")
     print(f"Execution finished at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}") 
\ No newline at end of file
@@ -0,0 +1,229 @@
+import argparse
+import io
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Record/replay transport under the requests sessions of llm.py, extras/extra.py,
+# formula_based_water_req.py and weather_ingest.py. Enable it with environment variables:
+#   HTTP_TRANSPORT_MODE=record|replay
+#   HTTP_TRANSPORT_PATH=http_recordings.jsonl (default: next to this module)
+#   HTTP_REPLAY_LATENCY=0.2 (seconds per response) or "recorded" (original timings)
+# or call install(session, mode, ...) directly.
+
+DEFAULT_RECORDING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'http_recordings.jsonl')
+
+# ================== RECORDINGS ==================
+def request_signature(method, url, body):
+    """Match key of a request: method, path + query and canonical JSON body (host and port ignored)"""
+    parts = urlsplit(url)
+    target = parts.path + (f"?{parts.query}" if parts.query else "")
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', errors='replace')
+    if body:
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False)
+        except ValueError:
+            pass
+    return f"{method.upper()} {target} {body or ''}"
+
+def load_recordings(path):
+    """Recorded exchanges grouped by request signature, in recording order"""
+    exchanges = defaultdict(list)
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                exchange = json.loads(line)
+                exchanges[exchange['signature']].append(exchange)
+    return exchanges
+
+# ================== ADAPTERS ==================
+class RecordingAdapter(HTTPAdapter):
+    """Sends requests normally and appends every request/response pair to a JSONL file"""
+
+    def __init__(self, path=DEFAULT_RECORDING_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        body = response.content  # reads streamed bodies too; the caller then iterates over the stored content
+        exchange = {
+            'signature': request_signature(request.method, request.url, request.body),
+            'method': request.method,
+            'url': request.url,
+            'request_body': request.body.decode('utf-8', errors='replace') if isinstance(request.body, bytes) else request.body,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {name: value for name, value in response.headers.items() if name.lower() in ('content-type', 'retry-after')},
+            'body': body.decode('utf-8', errors='replace'),
+            'elapsed_s': round(time.perf_counter() - started, 4),
+            'recorded_at': datetime.now().isoformat(timespec='seconds')
+        }
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(exchange, ensure_ascii=False) + "\n")
+        return response
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    Serves recorded responses without touching the network.
+
+    Requests are matched by request_signature(); repeated identical requests get the
+    recorded responses in order, then keep getting the last one. Each response is
+    delayed by `latency` seconds, or by its recorded time with latency='recorded'.
+    Unrecorded requests raise requests.ConnectionError.
+    """
+
+    def __init__(self, path=DEFAULT_RECORDING_PATH, latency=0.0, recordings=None, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self._queues = {signature: deque(exchanges) for signature, exchanges in (recordings or load_recordings(path)).items()}
+        self._lock = threading.Lock()
+        self.served = 0
+        self.unmatched = 0
+
+    def send(self, request, **kwargs):
+        signature = request_signature(request.method, request.url, request.body)
+        with self._lock:
+            queue = self._queues.get(signature)
+            if not queue:
+                self.unmatched += 1
+                raise requests.ConnectionError(f"No recorded response for {request.method} {request.url}", request=request)
+            exchange = queue.popleft() if len(queue) > 1 else queue[0]
+            self.served += 1
+
+        delay = exchange['elapsed_s'] if self.latency == 'recorded' else float(self.latency or 0)
+        if delay:
+            time.sleep(delay)
+
+        response = requests.Response()
+        response.status_code = exchange['status']
+        response.reason = exchange.get('reason')
+        response.headers = CaseInsensitiveDict(exchange['headers'])
+        response._content = exchange['body'].encode('utf-8')
+        response._content_consumed = True  # stream=True callers iterate over the stored body
+        response.raw = io.BytesIO(response._content)
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+def install(session, mode, path=DEFAULT_RECORDING_PATH, latency=0.0, recordings=None):
+    """Mount a recording or replaying adapter on `session` for http and https; returns the adapter"""
+    if mode == 'record':
+        adapter = RecordingAdapter(path)
+    elif mode == 'replay':
+        adapter = ReplayAdapter(path, latency, recordings)
+    else:
+        raise ValueError(f"Unknown transport mode '{mode}' (use 'record' or 'replay')")
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return adapter
+
+def configure_session(session):
+    """Apply HTTP_TRANSPORT_MODE/PATH and HTTP_REPLAY_LATENCY to `session`, if set; returns it"""
+    mode = os.getenv("HTTP_TRANSPORT_MODE")
+    if mode:
+        latency = os.getenv("HTTP_REPLAY_LATENCY", "0")
+        install(session, mode, os.getenv("HTTP_TRANSPORT_PATH", DEFAULT_RECORDING_PATH),
+                latency if latency == 'recorded' else float(latency))
+    return session
+
+# ================== PIPELINE ==================
+def run_pipeline(message):
+    """
+    One farmer request end to end: extraction (llm.py) -> get-crop on the backend ->
+    water calculation -> store-prediction. Returns per-stage seconds and the result
+    (None when the backend or the calculation fails; later stages are then skipped).
+    """
+    import llm
+    import formula_based_water_req as water
+
+    timings = {}
+    started = time.perf_counter()
+    farming_info = llm.extract_farming_info(message)
+    timings['extract'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    backend_response = llm.send_to_backend(farming_info)
+    timings['backend'] = time.perf_counter() - started
+    if not backend_response['success']:
+        return timings, None
+
+    started = time.perf_counter()
+    result = water.calculate_water_for_prediction(backend_response['data'])
+    timings['calculate'] = time.perf_counter() - started
+    if result is None:
+        return timings, None
+
+    started = time.perf_counter()
+    water.send_water_calculation_to_backend(result, water.BACKEND_BASE_URL)
+    timings['store'] = time.perf_counter() - started
+    return timings, result
+
+# ================== EXECUTE HARNESS ==================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record the farmer pipeline against local stubs, then replay it offline")
+    parser.add_argument("--path", default=DEFAULT_RECORDING_PATH)
+    parser.add_argument("--runs", type=int, default=20, help="Replayed pipeline runs")
+    parser.add_argument("--latency", default="0", help="Replay delay per response in seconds, or 'recorded'")
+    parser.add_argument("--message", default="I grow நெல் in red soil, planted 2026-09-01")
+    args = parser.parse_args()
+
+    import contextlib
+    from stub_upstreams import StubBackend, StubOpenRouter
+
+    # The calculator reads its CSVs relative to the working directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    os.environ.setdefault("OPENROUTER_API_KEY", "replay")
+    os.environ.setdefault("OPENROUTER_RPM", "6000")
+    if os.path.exists(args.path):
+        os.remove(args.path)
+
+    with StubOpenRouter(latency=0.1) as openrouter, StubBackend(latency=0.05) as backend:
+        os.environ["OPENROUTER_URL"] = f"{openrouter.base_url}/api/v1/chat/completions"
+        os.environ["BACKEND_API"] = f"{backend.base_url}/api/crop/get-crop"
+        import llm
+        import formula_based_water_req as water
+        water.BACKEND_BASE_URL = backend.base_url
+        llm.extraction_cache.max_memory_items = 0  # every run should reach the model
+        llm.extraction_cache.path = None
+
+        for session in (llm.session, water.HTTP_SESSION):
+            install(session, 'record', args.path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, recorded_result = run_pipeline(args.message)
+    if recorded_result is None:
+        print("Recording run failed; the replay would only repeat the failure")
+        raise SystemExit(1)
+    print(f"Recorded the pipeline to {args.path}; stubs stopped")
+
+    latency = args.latency if args.latency == 'recorded' else float(args.latency)
+    recordings = load_recordings(args.path)
+    for session in (llm.session, water.HTTP_SESSION):
+        install(session, 'replay', args.path, latency, recordings)
+
+    totals = defaultdict(float)
+    failures = 0
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.runs):
+            timings, result = run_pipeline(args.message)
+            failures += result is None
+            for stage, seconds in timings.items():
+                totals[stage] += seconds
+    elapsed = time.perf_counter() - started
+    print(f"Replayed {args.runs} runs offline in {elapsed:.2f}s ({args.runs / elapsed:.1f} runs/s), {failures} failed")
+    print({stage: f"{seconds * 1000 / args.runs:.1f} ms" for stage, seconds in totals.items()})
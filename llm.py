@@ -5,6 +5,12 @@ from dotenv import load_dotenv
 from typing import Optional
 from pydantic import BaseModel, Field
 import re
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from openrouter_limiter import LIMITER, PRIORITY_EXTRACTION, RateLimitDropped
+from result_cache import TwoTierCache, cache_key
+from http_transport import configure_session
 
 # Load API Key securely from environment variable
 load_dotenv()
@@ -12,8 +18,8 @@ API_KEY = os.getenv("OPENROUTER_API_KEY")
 if not API_KEY:
     raise ValueError("API Key missing! Set OPENROUTER_API_KEY in environment variables.")
 
-# OpenRouter API settings
-URL = "https://openrouter.ai/api/v1/chat/completions"
+# OpenRouter API settings (OPENROUTER_URL can point at a local stand-in)
+URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
 MODEL_NAME = "google/gemma-2-9b-it:free"
 
 # Validate model selection
@@ -22,7 +28,13 @@ if MODEL_NAME not in VALID_MODELS:
     raise ValueError(f"Invalid model '{MODEL_NAME}'. Choose from {VALID_MODELS}")
 
 # Backend API endpoint for sending data
-BACKEND_API = "https://ba7f-103-238-230-194.ngrok-free.app/api/crop/get-crop"
+BACKEND_API = os.getenv("BACKEND_API", "https://ba7f-103-238-230-194.ngrok-free.app/api/crop/get-crop")
+
+# Shared keep-alive session for OpenRouter and backend calls (also used by the chat server's threads)
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+configure_session(session)  # HTTP_TRANSPORT_MODE=record|replay, see http_transport.py
 
 # Tamil & English Mapping for Soil and Crops
 TAMIL_SOIL_MAP = {'சிவப்பு மண்': 'Red Soil', 'கருப்பு களிமண்': 'Black Clayey Soil', 'பழுப்பு மண்': 'Brown Soil', 'வண்டல் மண்': 'Alluvial Soil'}
@@ -44,11 +56,54 @@ def extract_json(response_text):
         print("JSON Parsing Error:", e)
         return None
 
+EXTRACTION_SYSTEM_MESSAGE = (
+    "You are an AI assistant that extracts farming information in JSON format."
+    "You MUST return ONLY JSON with three fields: soil_type, crop_type and planting_date."
+    "Extract every field the message mentions; planting_date must be in YYYY-MM-DD format."
+    "Ensure the JSON output follows this exact format:\n"
+    "{\n"
+    '  "soil_type": "Red Soil",\n'
+    '  "crop_type": "Rice",\n'
+    '  "planting_date": "2024-03-01"\n'
+    "}"
+    "If any value is missing, return null. Do NOT return explanations, only JSON."
+)
+
+# Extraction cache: normalized message -> extracted fields, in memory and on disk
+EXTRACTION_CACHE_PATH = "extraction_cache.sqlite"
+extraction_cache = TwoTierCache(EXTRACTION_CACHE_PATH, max_memory_items=2048, max_disk_items=50000, ttl=30 * 24 * 3600)
+extraction_counters = {"fast_path": 0, "model_calls": 0, "model_seconds": 0.0}
+extraction_counters_lock = threading.Lock()  # extraction runs on several chat server threads
+
+# Normalize a message for matching and cache keys (case, spacing, trailing punctuation)
+def normalize_message(text):
+    return re.sub(r"\s+", " ", text).strip().strip(".!?,;:").strip().casefold()
+
+# Exact names (Tamil and English) that map straight to a field, no model call needed
+KNOWN_SOILS = {normalize_message(name): soil for name, soil in TAMIL_SOIL_MAP.items()}
+KNOWN_SOILS.update({normalize_message(soil): soil for soil in TAMIL_SOIL_MAP.values()})
+KNOWN_CROPS = {normalize_message(name): crop for name, crop in TAMIL_CROP_MAP.items()}
+KNOWN_CROPS.update({normalize_message(crop): crop for crop in TAMIL_CROP_MAP.values()})
+
+def match_known_value(text):
+    """
+    Deterministic fast path: a message that is exactly a known soil or crop name, or a
+    YYYY-MM-DD date. Returns FarmingInfo, or None if the message needs the model.
+    """
+    normalized = normalize_message(text)
+    if validate_date(normalized):
+        return FarmingInfo(planting_date=normalized)
+    if normalized in KNOWN_SOILS:
+        return FarmingInfo(soil_type=KNOWN_SOILS[normalized])
+    if normalized in KNOWN_CROPS:
+        return FarmingInfo(crop_type=KNOWN_CROPS[normalized])
+    return None
+
 # Call OpenRouter API for **structured** JSON data extraction
-def extract_farming_info(conversation_text):
+def extract_farming_info_from_model(conversation_text):
     """
-    Extracts soil type and crop type from the conversation.
-    Farmers must enter the planting date in YYYY-MM-DD format.
+    Asks the model for soil type, crop type and planting date in one call. Returns (FarmingInfo, parsed), where
+    parsed is False if the reply held no usable JSON.
     """
 
     headers = {
@@ -56,28 +111,16 @@ def extract_farming_info(conversation_text):
         "Content-Type": "application/json"
     }
 
-    system_message = (
-        "You are an AI assistant that extracts farming information in JSON format."
-        "You MUST return ONLY JSON with two fields: soil_type and crop_type."
-        "The user will enter the planting date manually in YYYY-MM-DD format."
-        "Ensure the JSON output follows this exact format:\n"
-        "{\n"
-        '  "soil_type": "Red Soil",\n'
-        '  "crop_type": "Rice"\n'
-        "}"
-        "If any value is missing, return null. Do NOT return explanations, only JSON."
-    )
-
     payload = {
         "model": MODEL_NAME,
         "messages": [
-            {"role": "system", "content": system_message},
+            {"role": "system", "content": EXTRACTION_SYSTEM_MESSAGE},
             {"role": "user", "content": conversation_text}
         ],
         "temperature": 0.1  # Low temperature for accuracy
     }
 
-    response = requests.post(URL, headers=headers, json=payload, timeout=10)
+    response = session.post(URL, headers=headers, json=payload, timeout=10)
     response.raise_for_status()
     response_text = response.json()["choices"][0]["message"]["content"]
 
@@ -87,13 +130,73 @@ def extract_farming_info(conversation_text):
         # Convert Tamil mappings if needed
         soil = TAMIL_SOIL_MAP.get(extracted_data.get("soil_type"), extracted_data.get("soil_type"))
         crop = TAMIL_CROP_MAP.get(extracted_data.get("crop_type"), extracted_data.get("crop_type"))
+        planting_date = extracted_data.get("planting_date")
 
         return FarmingInfo(
             soil_type=soil,
             crop_type=crop,
-        )
+            planting_date=planting_date if isinstance(planting_date, str) and validate_date(planting_date) else None,
+        ), True
+
+    return FarmingInfo(), False  # Return empty object if extraction fails
+
+def extract_farming_info(conversation_text):
+    """
+    Extracts soil type, crop type and planting date (YYYY-MM-DD) from the conversation.
+
+    Exact soil/crop names and dates are matched without calling the model; other messages are
+    looked up in the extraction cache (by normalized text, model and prompt) first. Model
+    calls go through the shared OpenRouter limiter at extraction priority, and identical
+    messages already being extracted share that call.
+    """
+    known = match_known_value(conversation_text)
+    if known:
+        with extraction_counters_lock:
+            extraction_counters["fast_path"] += 1
+        return known
+
+    key = cache_key(MODEL_NAME, EXTRACTION_SYSTEM_MESSAGE, normalize_message(conversation_text))
+    cached = extraction_cache.get(key)
+    if cached is not None:
+        return FarmingInfo(**cached)
+
+    def ask_model():
+        started = time.perf_counter()
+        outcome = extract_farming_info_from_model(conversation_text)
+        with extraction_counters_lock:
+            extraction_counters["model_calls"] += 1
+            extraction_counters["model_seconds"] += time.perf_counter() - started
+        return outcome
+
+    try:
+        farming_info, parsed = LIMITER.call(ask_model, PRIORITY_EXTRACTION, key=key)
+    except RateLimitDropped as e:
+        print(f"⚠️ Extraction skipped: {e}")
+        return FarmingInfo()
+    if parsed:
+        extraction_cache.put(key, farming_info.dict())
+    return farming_info
 
-    return FarmingInfo()  # Return empty object if extraction fails
+def extraction_stats():
+    """
+    Fast-path and cache hit counts, hit rate and the model time they saved (estimated
+    from the average latency of the model calls that were made)
+    """
+    cache_stats = extraction_cache.stats()
+    with extraction_counters_lock:
+        counters = dict(extraction_counters)
+    calls = counters["model_calls"]
+    avoided = counters["fast_path"] + cache_stats["memory_hits"] + cache_stats["disk_hits"]
+    average_latency = counters["model_seconds"] / calls if calls else 0.0
+    return {
+        "fast_path": counters["fast_path"],
+        "memory_hits": cache_stats["memory_hits"],
+        "disk_hits": cache_stats["disk_hits"],
+        "model_calls": calls,
+        "hit_rate": round(avoided / (avoided + calls), 3) if avoided + calls else None,
+        "avg_model_latency_s": round(average_latency, 3),
+        "latency_saved_s": round(avoided * average_latency, 2)
+    }
 
 # Validate YYYY-MM-DD date format
 def validate_date(date_str):
@@ -125,7 +228,7 @@ def send_to_backend(farming_data):
     try:
         # Send the data to the backend
         headers = {"Content-Type": "application/json"}
-        response = requests.post(BACKEND_API, json=payload, headers=headers, timeout=10)
+        response = session.post(BACKEND_API, json=payload, headers=headers, timeout=10)
         
         # Check if the request was successful
         if response.status_code == 200:
@@ -140,70 +243,114 @@ def send_to_backend(farming_data):
         print(f"❌ API call failed with exception: {str(e)}")
         return {"success": False, "error": str(e)}
 
+# Conversation state machine: collect soil type, crop type and planting date, then questions
+SLOT_QUESTIONS = {
+    "soil_type": "your soil type (e.g., Red Soil, Black Soil)",
+    "crop_type": "the crop you are growing",
+    "planting_date": "the planting date in YYYY-MM-DD format (e.g., 2024-03-01)"
+}
+
+class FarmerConversation:
+    """
+    One farmer's conversation, advanced one message at a time with handle().
+
+    Every message is searched for all the slots still missing (soil type, crop type,
+    planting date) with a single extraction call, so a farmer who gives everything at
+    once is done in one round trip. Slots already filled are kept and only the missing
+    ones are asked for again. Once complete, the data goes to the backend and further
+    messages are farming questions. `extract` and `submit` default to
+    extract_farming_info and send_to_backend.
+    """
+
+    GREETING = (
+        "🌾 Welcome to the Farmer Assistant! (Supports Tamil & English)\n"
+        "I will collect your soil type, crop type, and plantation date before continuing."
+    )
+
+    def __init__(self, extract=None, submit=None):
+        self.farming_data = FarmingInfo()  # Initialize empty farming data
+        self.backend_response = None
+        self.extract = extract or extract_farming_info
+        self.submit = submit or send_to_backend
+
+    def missing_slots(self):
+        return [slot for slot in SLOT_QUESTIONS if not getattr(self.farming_data, slot)]
+
+    @property
+    def stage(self):
+        missing = self.missing_slots()
+        return {"soil_type": "soil", "crop_type": "crop", "planting_date": "date"}[missing[0]] if missing else "questions"
+
+    def prompt(self):
+        """Question for the slots still missing"""
+        missing = self.missing_slots()
+        if not missing:
+            return "🌾 Now you can ask me any farming-related questions!"
+        questions = [SLOT_QUESTIONS[slot] for slot in missing]
+        if len(questions) > 1:
+            questions = [", ".join(questions[:-1]) + " and " + questions[-1]]
+        return f"🤖 Please tell me {questions[0]}."
+
+    def handle(self, user_input):
+        """Advance the conversation with one user message; returns the reply text"""
+        user_input = user_input.strip()
+        missing = self.missing_slots()
+
+        if missing:
+            extracted_info = self.extract(user_input)
+            filled = [slot for slot in missing if getattr(extracted_info, slot)]
+            for slot in filled:
+                setattr(self.farming_data, slot, getattr(extracted_info, slot))
+
+            if not self.missing_slots():
+                return self.complete()
+            if not filled and missing == ["planting_date"]:
+                return "⚠️ Invalid format! Please enter the date as YYYY-MM-DD (e.g., 2024-03-01)."
+            if not filled and missing == ["crop_type"]:
+                return "⚠️ Please enter a valid crop type."
+            noted = ", ".join(getattr(self.farming_data, slot) for slot in filled)
+            return (f"✅ Noted: {noted}.\n" if noted else "") + self.prompt()
+
+        # Here you would typically handle the farming questions
+        # For now, just give a simple response
+        return "I'm here to help with your farming questions based on your soil type, crop, and planting date."
+
+    def complete(self):
+        """Send the collected data to the backend and summarize the outcome"""
+        lines = ["✅ Farming Information Collected:", json.dumps(self.farming_data.dict(), indent=2)]
+
+        # Send data to the backend API
+        self.backend_response = self.submit(self.farming_data)
+
+        if self.backend_response["success"]:
+            lines.append("✅ Data successfully sent to the server!")
+            if "data" in self.backend_response and self.backend_response["data"]:
+                lines.append("📊 Server Response:")
+                lines.append(json.dumps(self.backend_response["data"], indent=2))
+        else:
+            lines.append("❌ Failed to send data to the server.")
+            lines.append(f"Error: {self.backend_response.get('error', 'Unknown error')}")
+
+        lines.append(self.prompt())
+        return "\n".join(lines)
+
 def chat():
-    print("🌾 Welcome to the Farmer Assistant! (Supports Tamil & English)")
-    print("I will collect your soil type, crop type, and plantation date before continuing.\n")
-
-    farming_data = FarmingInfo()  # Initialize empty farming data
-
-    while not (farming_data.soil_type and farming_data.crop_type and farming_data.planting_date):
-        if not farming_data.soil_type:
-            user_input = input("> ").strip()
-            extracted_info = extract_farming_info(user_input)
-            if extracted_info.soil_type:
-                farming_data.soil_type = extracted_info.soil_type
-            else:
-                print("🤖 What is your soil type? (e.g., Red Soil, Black Soil)")
-                continue
-
-        if not farming_data.crop_type:
-            user_input = input("🤖 What crop are you growing? ").strip()
-            extracted_info = extract_farming_info(user_input)
-            if extracted_info.crop_type:
-                farming_data.crop_type = extracted_info.crop_type
-            else:
-                print("⚠️ Please enter a valid crop type.")
-                continue
-
-        if not farming_data.planting_date:
-            while True:
-                planting_date = input("🤖 Enter the planting date in YYYY-MM-DD format (e.g., 2024-03-01): ").strip()
-                if validate_date(planting_date):
-                    farming_data.planting_date = planting_date
-                    break
-                else:
-                    print("⚠️ Invalid format! Please enter the date as YYYY-MM-DD (e.g., 2024-03-01).")
-
-    # Print Final JSON
-    print("\n✅ Farming Information Collected:")
-    print(json.dumps(farming_data.dict(), indent=2))
-    
-    # Send data to the backend API
-    api_response = send_to_backend(farming_data)
-    
-    if api_response["success"]:
-        print("\n✅ Data successfully sent to the server!")
-        if "data" in api_response and api_response["data"]:
-            print("\n📊 Server Response:")
-            print(json.dumps(api_response["data"], indent=2))
-    else:
-        print("\n❌ Failed to send data to the server.")
-        print(f"Error: {api_response.get('error', 'Unknown error')}")
-
-    print("\n🌾 Now you can ask me any farming-related questions!")
-    print("Type 'quit' to exit.\n")
-    
-    # Continue with farming questions
+    conversation = FarmerConversation()
+    print(conversation.GREETING)
+    print(conversation.prompt() + "\n")
+
     while True:
         user_input = input("> ").strip()
-        
-        if user_input.lower() in ["quit", "exit"]:
+
+        if conversation.stage == "questions" and user_input.lower() in ["quit", "exit"]:
             print("Thank you for using the Farmer Assistant. Goodbye!")
+            print(f"Extraction stats: {extraction_stats()}")
             break
-        
-        # Here you would typically handle the farming questions
-        # For now, just give a simple response
-        print("I'm here to help with your farming questions based on your soil type, crop, and planting date.")
+
+        previous_stage = conversation.stage
+        print(conversation.handle(user_input))
+        if previous_stage != "questions" and conversation.stage == "questions":
+            print("Type 'quit' to exit.\n")
 
 # Run Chatbot
 if __name__ == "__main__":
@@ -0,0 +1,287 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+# Synthetic farmer sessions against local stand-ins for OpenRouter and the backend.
+# Each session is one llm.FarmerConversation scripted in Tamil or English: soil, crop
+# and planting date (all at once, one per message, or with a malformed date first),
+# then follow-up questions. Once the conversation is complete the backend's record
+# goes through the water calculation and the result is stored, as the worker does.
+# Sessions start at Poisson arrival times (`--rate` per second), and every stage is
+# timed from the moment it was due, so queueing behind a saturated pool is counted.
+
+STAGES = ('extract', 'backend', 'water', 'store', 'followup', 'turn', 'start_delay', 'session')
+
+# ================== SESSION SCRIPTS ==================
+ENGLISH_FULL = (
+    "I have {soil} and I am growing {crop}, planted on {date}",
+    "My field is {soil}. Crop is {crop}. Planting date {date}",
+    "{crop} in {soil}, sown {date}"
+)
+TAMIL_FULL = (
+    "என் நிலம் {soil}, நான் {crop} பயிரிட்டேன், நடவு தேதி {date}",
+    "{soil} நிலத்தில் {crop} {date} அன்று நடவு செய்தேன்"
+)
+ENGLISH_PARTIAL = ("My soil is {soil}", "We grow {crop} here", "I planted it on {date}")
+TAMIL_PARTIAL = ("என் மண் {soil}", "நான் {crop} பயிரிடுகிறேன்", "நடவு தேதி {date}")
+MALFORMED_DATES = {'english': ("last month", "around the 5th", "01/03/24"), 'tamil': ("போன மாதம்", "ஐந்தாம் தேதி")}
+FOLLOWUPS = {
+    'english': ("How often should I water?", "Is it too hot to irrigate at noon?", "Should I add mulch?",
+                "When is the next irrigation?", "How much water per acre?"),
+    'tamil': ("எத்தனை நாளுக்கு ஒரு முறை தண்ணீர் பாய்ச்ச வேண்டும்?", "மதியம் தண்ணீர் பாய்ச்சலாமா?",
+              "ஏக்கருக்கு எவ்வளவு தண்ணீர் தேவை?", "அடுத்த பாசனம் எப்போது?")
+}
+
+def build_session_script(rng, soil_map, crop_map, today=None):
+    """
+    One scripted farmer session: (language, style, messages). Soils and crops are drawn
+    from the Tamil/English vocabularies, planting dates from the last 150 days.
+    """
+    today = today or date.today()
+    language = rng.choice(('english', 'tamil'))
+    tamil_soil, soil = rng.choice(list(soil_map.items()))
+    tamil_crop, crop = rng.choice(list(crop_map.items()))
+    if language == 'tamil':
+        soil, crop = tamil_soil, tamil_crop
+    planted = (today - timedelta(days=rng.randint(10, 150))).isoformat()
+    values = {'soil': soil, 'crop': crop, 'date': planted}
+
+    style = rng.choice(('all_at_once', 'one_per_message', 'names_only', 'malformed_date'))
+    if style == 'all_at_once':
+        templates = ENGLISH_FULL if language == 'english' else TAMIL_FULL
+        messages = [rng.choice(templates).format(**values)]
+    elif style == 'names_only':
+        messages = [soil, crop, planted]  # exact names: the deterministic fast path
+    else:
+        templates = ENGLISH_PARTIAL if language == 'english' else TAMIL_PARTIAL
+        messages = [template.format(**values) for template in templates]
+        if style == 'malformed_date':
+            messages.insert(2, rng.choice(MALFORMED_DATES[language]))
+
+    messages += rng.sample(FOLLOWUPS[language], rng.randint(0, 3))
+    return language, style, messages
+
+# ================== STAGE RECORDING ==================
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+class StageRecorder:
+    """Latencies (seconds) and error counts per stage; thread-safe"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {stage: [] for stage in STAGES}
+        self.errors = {stage: 0 for stage in STAGES}
+        self.error_samples = []
+
+    def record(self, stage, seconds, error=None):
+        with self.lock:
+            self.latencies[stage].append(seconds)
+            if error is not None:
+                self.errors[stage] += 1
+                if len(self.error_samples) < 10:
+                    self.error_samples.append(f"{stage}: {error}")
+
+    def timed(self, stage, func, failed=None):
+        """Wrap func so each call is recorded under `stage`; failed(result) marks error results"""
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self.record(stage, time.perf_counter() - started, e)
+                raise
+            error = failed(result) if failed else None
+            self.record(stage, time.perf_counter() - started, error)
+            return result
+        return call
+
+    def report(self, elapsed):
+        """Per stage: count, errors, error rate, throughput (per second) and latency percentiles (ms)"""
+        with self.lock:
+            report = {}
+            for stage in STAGES:
+                latencies = self.latencies[stage]
+                if not latencies:
+                    continue
+                report[stage] = {
+                    'count': len(latencies),
+                    'errors': self.errors[stage],
+                    'error_rate': round(self.errors[stage] / len(latencies), 4),
+                    'throughput_per_s': round(len(latencies) / elapsed, 2),
+                    'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+                    'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+                    'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+                    'max_ms': round(max(latencies) * 1000, 2)
+                }
+            return report
+
+# ================== LOAD GENERATOR ==================
+class LoadGenerator:
+    """
+    Drives scripted sessions through llm.FarmerConversation at a target arrival rate.
+
+    `llm` and `water` are the imported llm and formula_based_water_req modules (imported
+    by the caller once the stub URLs are in the environment). Up to `concurrency`
+    sessions run at once; later arrivals wait for a free slot and that wait is part of
+    their latency. `think_time` seconds pass between a farmer's messages.
+    """
+
+    def __init__(self, llm, water, concurrency=64, think_time=0.0, result_cache=None, seed=0):
+        self.llm = llm
+        self.water = water
+        self.concurrency = concurrency
+        self.think_time = think_time
+        self.result_cache = result_cache
+        self.rng = random.Random(seed)
+        self.recorder = StageRecorder()
+        self.extract = self.recorder.timed('extract', llm.extract_farming_info)
+        self.submit = self.recorder.timed('backend', llm.send_to_backend,
+                                          failed=lambda response: None if response['success'] else response.get('error'))
+        self.calculate = self.recorder.timed('water', water.calculate_water_for_prediction,
+                                             failed=lambda result: None if result else "no result")
+        self.store = self.recorder.timed('store', water.send_water_calculation_to_backend,
+                                         failed=lambda stored: None if stored else "not stored")
+        self.languages = {'english': 0, 'tamil': 0}
+        self.styles = {}
+
+    def run_session(self, due, script):
+        self.recorder.record('start_delay', time.perf_counter() - due)
+        language, style, messages = script
+        conversation = self.llm.FarmerConversation(extract=self.extract, submit=self.submit)
+        error = None
+        try:
+            for message in messages:
+                stage = 'followup' if conversation.stage == 'questions' else 'turn'
+                self.recorder.timed(stage, conversation.handle)(message)
+                if conversation.backend_response is not None and stage == 'turn' and conversation.stage == 'questions':
+                    error = self.finish_pipeline(conversation)
+                if self.think_time:
+                    time.sleep(self.think_time)
+            if conversation.stage != 'questions':
+                error = error or f"incomplete ({conversation.stage} missing)"
+        except Exception as e:
+            error = e
+        self.recorder.record('session', time.perf_counter() - due, error)
+
+    def finish_pipeline(self, conversation):
+        """Water calculation and storage for the record the backend returned"""
+        response = conversation.backend_response
+        if not response['success']:
+            return response.get('error')
+        result = self.calculate(response['data'], result_cache=self.result_cache)
+        if not result:
+            return "water calculation failed"
+        if not self.store(result, self.water.BACKEND_BASE_URL):
+            return "store failed"
+        return None
+
+    def run(self, rate, duration):
+        """Start sessions at Poisson arrivals of `rate`/s for `duration` seconds; returns the report"""
+        arrivals = []
+        offset = self.rng.expovariate(rate)
+        while offset < duration:
+            arrivals.append(offset)
+            offset += self.rng.expovariate(rate)
+        scripts = [build_session_script(self.rng, self.llm.TAMIL_SOIL_MAP, self.llm.TAMIL_CROP_MAP) for _ in arrivals]
+        for language, style, _ in scripts:
+            self.languages[language] += 1
+            self.styles[style] = self.styles.get(style, 0) + 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='farmer') as executor:
+            for offset, script in zip(arrivals, scripts):
+                due = started + offset
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self.run_session, due, script)
+        elapsed = time.perf_counter() - started
+
+        return {
+            'target_rate_per_s': rate,
+            'duration_s': round(elapsed, 2),
+            'sessions': len(arrivals),
+            'achieved_rate_per_s': round(len(arrivals) / elapsed, 2) if elapsed else None,
+            'languages': self.languages,
+            'styles': self.styles,
+            'stages': self.recorder.report(elapsed),
+            'error_samples': self.recorder.error_samples,
+            'extraction': self.llm.extraction_stats(),
+            'openrouter_limiter': self.llm.LIMITER.stats()
+        }
+
+def print_report(report):
+    print(f"Sessions: {report['sessions']} in {report['duration_s']}s "
+          f"(target {report['target_rate_per_s']}/s, achieved {report['achieved_rate_per_s']}/s)")
+    print(f"Languages: {report['languages']}  Styles: {report['styles']}")
+    print(f"{'stage':<12}{'count':>8}{'errors':>8}{'err %':>8}{'per s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage, row in report['stages'].items():
+        print(f"{stage:<12}{row['count']:>8}{row['errors']:>8}{row['error_rate'] * 100:>8.2f}{row['throughput_per_s']:>9.2f}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
+    for sample in report['error_samples']:
+        print(f"  error {sample}")
+    print(f"Extraction: {report['extraction']}")
+    print(f"OpenRouter limiter: {report['openrouter_limiter']}")
+
+# ================== EXECUTE LOAD TEST ==================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic farmer-session load against local stub upstreams")
+    parser.add_argument("--rate", type=float, default=20, help="Target session arrivals per second")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of arrivals")
+    parser.add_argument("--concurrency", type=int, default=64, help="Sessions running at once")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds between a farmer's messages")
+    parser.add_argument("--openrouter-latency", type=float, default=0.3)
+    parser.add_argument("--backend-latency", type=float, default=0.05)
+    parser.add_argument("--openrouter-rpm", type=float, default=60000, help="Client-side OpenRouter rate limit")
+    parser.add_argument("--backend-failures", type=int, default=0, help="Backend responses to replace with 503s")
+    parser.add_argument("--result-cache", action="store_true", help="Reuse water results for identical inputs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    from stub_upstreams import StubBackend, StubOpenRouter
+
+    # The calculator reads its CSVs relative to the working directory
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    with StubOpenRouter(latency=args.openrouter_latency) as openrouter, StubBackend(latency=args.backend_latency) as backend:
+        os.environ.setdefault("OPENROUTER_API_KEY", "load-test")
+        os.environ["OPENROUTER_RPM"] = str(args.openrouter_rpm)
+        os.environ.setdefault("OPENROUTER_BURST", str(max(5, args.concurrency)))
+        os.environ["OPENROUTER_URL"] = f"{openrouter.base_url}/api/v1/chat/completions"
+        os.environ["BACKEND_API"] = f"{backend.base_url}/api/crop/get-crop"
+        import llm
+        import formula_based_water_req as water
+        from result_cache import TwoTierCache
+        from water_metrics import set_quiet
+
+        set_quiet()
+        water.BACKEND_BASE_URL = backend.base_url
+        llm.extraction_cache = TwoTierCache(None, max_memory_items=2048)  # start cold, leave the on-disk cache alone
+        backend.fail_next = args.backend_failures
+
+        generator = LoadGenerator(llm, water, args.concurrency, args.think_time,
+                                  result_cache=water.create_result_cache(None) if args.result_cache else None,
+                                  seed=args.seed)
+        print(f"Running {args.rate} sessions/s for {args.duration}s against local stubs...")
+        with contextlib.redirect_stdout(io.StringIO()):  # the conversation helpers print every step
+            report = generator.run(args.rate, args.duration)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        print(f"Report written to {args.json}")
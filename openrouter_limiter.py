@@ -0,0 +1,182 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+
+# Client-side rate control for OpenRouter, shared by every caller in the process
+# (llm.py, extras/extra.py, the chat server's threads). The free tier allows about
+# 20 requests per minute; OPENROUTER_RPM and OPENROUTER_BURST override the defaults.
+
+PRIORITY_EXTRACTION = 0  # structured extraction moves the conversation forward: served first
+PRIORITY_CHAT = 1
+
+class RateLimitDropped(Exception):
+    """The request was not sent: the queue was full or it waited longer than max_wait"""
+
+class _SharedCall:
+    """Result of one in-flight upstream call, handed to every coalesced caller"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+# ================== LIMITER ==================
+class OpenRouterLimiter:
+    """
+    Token bucket (`rate_per_minute`, bursts of up to `burst`) with a priority queue.
+
+    Callers wait in priority order (lower value first, then arrival order) for a
+    token. A caller is dropped with RateLimitDropped when `max_queue` callers are
+    already waiting or after waiting `max_wait` seconds. A 429 from the provider pauses
+    the bucket for its Retry-After. call() with a `key` coalesces identical in-flight
+    requests: later callers wait for the first one's result instead of sending again.
+    """
+
+    def __init__(self, rate_per_minute=20, burst=5, max_queue=200, max_wait=60, default_pause=10):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.default_pause = default_pause
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = []  # heap of (priority, arrival, condition) entries
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped_queue_full = 0
+        self.dropped_timeout = 0
+        self.rate_limited = 0
+        self.wait_s = 0.0
+        self.max_wait_s = 0.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(rate_per_minute=float(os.getenv("OPENROUTER_RPM", 20)), burst=int(os.getenv("OPENROUTER_BURST", 5)))
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _wake_head(self):
+        if self._waiting:
+            self._waiting[0][2].notify()
+
+    def acquire(self, priority=PRIORITY_CHAT):
+        """
+        Block until this caller may send one request; returns the seconds spent waiting.
+
+        Only the caller at the head of the queue sleeps on the clock (until its token is
+        due or a pause ends); the others sleep until they become the head.
+        """
+        with self._lock:
+            if len(self._waiting) >= self.max_queue:
+                self.dropped_queue_full += 1
+                raise RateLimitDropped(f"OpenRouter queue full ({self.max_queue} waiting)")
+            entry = (priority, next(self._sequence), threading.Condition(self._lock))
+            heapq.heappush(self._waiting, entry)
+            queued = time.monotonic()
+            deadline = queued + self.max_wait
+            while True:
+                now = time.monotonic()
+                at_head = self._waiting[0] is entry
+                if at_head:
+                    self._refill(now)
+                    if self._tokens >= 1 and now >= self._paused_until:
+                        heapq.heappop(self._waiting)
+                        self._tokens -= 1
+                        waited = now - queued
+                        self.sent += 1
+                        self.wait_s += waited
+                        self.max_wait_s = max(self.max_wait_s, waited)
+                        self._wake_head()  # the next caller in line may now take a token
+                        return waited
+                if now >= deadline:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self.dropped_timeout += 1
+                    if at_head:
+                        self._wake_head()
+                    raise RateLimitDropped(f"Waited {self.max_wait}s for an OpenRouter slot")
+                if at_head:
+                    next_token = (1 - self._tokens) / self.rate if self.rate else self.max_wait
+                    entry[2].wait(min(deadline - now, max(next_token, self._paused_until - now)))
+                else:
+                    entry[2].wait(deadline - now)
+
+    def report_rate_limited(self, retry_after=None):
+        """Pause all sending after a 429 (Retry-After seconds, or default_pause)"""
+        try:
+            pause = float(retry_after)
+        except (TypeError, ValueError):
+            pause = self.default_pause
+        with self._lock:
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self._tokens = 0.0
+
+    def call(self, func, priority=PRIORITY_CHAT, key=None):
+        """
+        Run func() (one upstream request) once a token is available and return its result.
+        Callers passing the same `key` while a call is pending share that call.
+        """
+        shared = None
+        if key is not None:
+            with self._lock:
+                pending = self._in_flight.get(key)
+                if pending is None:
+                    shared = self._in_flight[key] = _SharedCall()
+                else:
+                    self.coalesced += 1
+            if pending is not None:
+                return pending.wait()
+
+        try:
+            self.acquire(priority)
+            try:
+                result = func()
+            except Exception as e:
+                response = getattr(e, 'response', None)
+                if getattr(response, 'status_code', None) == 429:
+                    self.report_rate_limited(response.headers.get('Retry-After'))
+                raise
+        except Exception as e:
+            if shared is not None:
+                shared.error = e
+            raise
+        else:
+            if shared is not None:
+                shared.result = result
+            return result
+        finally:
+            if shared is not None:
+                with self._lock:
+                    self._in_flight.pop(key, None)
+                shared.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate_per_minute': round(self.rate * 60, 2),
+                'queue_depth': len(self._waiting),
+                'sent': self.sent,
+                'coalesced': self.coalesced,
+                'dropped_queue_full': self.dropped_queue_full,
+                'dropped_timeout': self.dropped_timeout,
+                'rate_limited': self.rate_limited,
+                'avg_wait_s': round(self.wait_s / self.sent, 3) if self.sent else None,
+                'max_wait_s': round(self.max_wait_s, 3)
+            }
+
+LIMITER = OpenRouterLimiter.from_env()
@@ -0,0 +1,239 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from formula_based_water_req import (
+    align_weather_to_season,
+    calculate_eto_batch,
+    day_of_year_series,
+    load_location_constants,
+    season_weather_arrays,
+)
+
+LOCATION_CONSTANTS_CSV = 'krishnan_kovil_constants.csv'
+REGIONAL_ETO_PATH = 'regional_eto.npy'   # metadata goes next to it in regional_eto.npy.json
+
+# District grid around the constants file's location
+DISTRICT_HALF_EXTENT = 0.25   # degrees north/south/east/west of the centre (~28 km)
+GRID_RESOLUTION = 0.02        # degrees between grid nodes (~2 km)
+IDW_POWER = 2                 # inverse-distance weighting of station forecasts onto the grid
+ELEVATION_TOLERANCE = 10      # m; fields further from the raster's elevation are computed per point
+
+# ================== DISTRICT GRID ==================
+class RegionalGrid:
+    """Regular lat/lon grid: `rows` x `cols` nodes `step` degrees apart from the south-west corner"""
+
+    def __init__(self, lat0, lon0, step, rows, cols):
+        if rows < 2 or cols < 2:
+            raise ValueError("A regional grid needs at least 2 x 2 nodes for interpolation")
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.step = step
+        self.rows = rows
+        self.cols = cols
+
+    @classmethod
+    def around(cls, latitude, longitude, half_extent=DISTRICT_HALF_EXTENT, step=GRID_RESOLUTION):
+        """Grid centred on a location, reaching at least `half_extent` degrees each way"""
+        nodes = int(math.ceil(half_extent / step))
+        return cls(latitude - nodes * step, longitude - nodes * step, step, 2 * nodes + 1, 2 * nodes + 1)
+
+    def latitudes(self):
+        return self.lat0 + self.step * np.arange(self.rows)
+
+    def longitudes(self):
+        return self.lon0 + self.step * np.arange(self.cols)
+
+    def contains(self, lat, lon):
+        row = (lat - self.lat0) / self.step
+        col = (lon - self.lon0) / self.step
+        return 0 <= row <= self.rows - 1 and 0 <= col <= self.cols - 1
+
+    def to_dict(self):
+        return {'lat0': self.lat0, 'lon0': self.lon0, 'step': self.step, 'rows': self.rows, 'cols': self.cols}
+
+# ================== DISTRICT WEATHER ==================
+def station_weights(grid, stations, power=IDW_POWER):
+    """(stations, rows, cols) inverse-distance weights, normalized per grid node"""
+    lat_grid, lon_grid = np.meshgrid(grid.latitudes(), grid.longitudes(), indexing='ij')
+    distance = np.stack([np.hypot(lat_grid - station['latitude'], lon_grid - station['longitude']) for station in stations])
+    weights = 1.0 / np.maximum(distance, 1e-6) ** power  # a node on a station takes that station's weather
+    return weights / weights.sum(axis=0)
+
+def station_weather_arrays(stations, start_date, days):
+    """Per-station daily tmin, tmax, wind speed, RH min and RH max, each (stations, days), aligned by date"""
+    columns = [season_weather_arrays(align_weather_to_season(station['weather_data'], start_date, days), days)
+               for station in stations]
+    return [np.stack(values) for values in zip(*columns)]
+
+# ================== RASTER BUILD ==================
+def build_eto_raster(path, grid, start_date, days, elevation, stations=None, dtype=np.float32):
+    """
+    Compute daily ETo (mm/day) over `grid` for `days` days from `start_date` and store it
+    as a (days, rows, cols) memory-mapped .npy file at `path`, with metadata in path.json.
+
+    Each day is one calculate_eto_batch call over the whole grid. Weather comes from
+    `stations` (dicts with latitude, longitude and a dated weather_data list, as
+    weather_ingest.iter_daily_weather yields) interpolated by inverse distance; days a
+    station has no record for, or no stations at all, use the calculator's defaults.
+    `elevation` is one value for the district (the constants file has no terrain).
+    Returns the EToRaster.
+    """
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    values = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(days, grid.rows, grid.cols))
+    doys = day_of_year_series([start], days)[0]
+    lat_column = grid.latitudes()[:, None]  # radiation varies by row only: one table per grid row
+
+    if stations:
+        weights = station_weights(grid, stations)
+        weather = station_weather_arrays(stations, start, days)
+    else:
+        weather = season_weather_arrays(None, days)
+
+    for day in range(days):
+        if stations:
+            tmin, tmax, wind_speed, rh_min, rh_max = (np.tensordot(column[:, day], weights, axes=1) for column in weather)
+        else:
+            tmin, tmax, wind_speed, rh_min, rh_max = (column[day] for column in weather)
+        values[day] = calculate_eto_batch(tmin, tmax, elevation, lat_column, doys[day], wind_speed, rh_min, rh_max)
+
+    values.flush()
+    del values
+    with open(path + '.json', 'w') as file:
+        json.dump({
+            'grid': grid.to_dict(),
+            'start_date': start_date,
+            'days': days,
+            'elevation': elevation,
+            'stations': len(stations or []),
+            'created': datetime.now().isoformat(timespec='seconds')
+        }, file, indent=2)
+    return EToRaster(path)
+
+# ================== RASTER QUERIES ==================
+class EToRaster:
+    """
+    Read-only view of a raster written by build_eto_raster. The values stay on disk
+    (memory-mapped); a field query reads the four surrounding grid nodes and
+    interpolates bilinearly, so its cost does not depend on the grid size.
+    """
+
+    def __init__(self, path=REGIONAL_ETO_PATH):
+        with open(path + '.json') as file:
+            self.metadata = json.load(file)
+        self.grid = RegionalGrid(**self.metadata['grid'])
+        self.start_date = datetime.strptime(self.metadata['start_date'], "%Y-%m-%d")
+        self.days = self.metadata['days']
+        self.values = np.load(path, mmap_mode='r')
+
+    def day_index(self, date):
+        if isinstance(date, str):
+            date = datetime.strptime(date, "%Y-%m-%d")
+        return (date - self.start_date).days
+
+    def covers(self, location, start_date, days):
+        """
+        Whether the raster has this location and all `days` days from start_date, at the
+        elevation it was built for (within ELEVATION_TOLERANCE)
+        """
+        if location.get('latitude') is None or location.get('longitude') is None or location.get('elevation') is None:
+            return False
+        if abs(location['elevation'] - self.metadata['elevation']) > ELEVATION_TOLERANCE:
+            return False
+        first = self.day_index(start_date)
+        return first >= 0 and first + days <= self.days and self.grid.contains(location['latitude'], location['longitude'])
+
+    def _corners(self, lat, lon):
+        """Top-left node and bilinear weights (2 x 2) for a point inside the grid"""
+        if not self.grid.contains(lat, lon):
+            raise ValueError(f"Location ({lat}, {lon}) is outside the regional grid")
+        row = (lat - self.grid.lat0) / self.grid.step
+        col = (lon - self.grid.lon0) / self.grid.step
+        i = min(int(row), self.grid.rows - 2)
+        j = min(int(col), self.grid.cols - 2)
+        t, u = row - i, col - j
+        return i, j, np.array([[(1 - t) * (1 - u), (1 - t) * u], [t * (1 - u), t * u]])
+
+    def eto(self, lat, lon, date):
+        """Interpolated ETo (mm/day) at a point on one date"""
+        day = self.day_index(date)
+        if not 0 <= day < self.days:
+            raise ValueError(f"{date} is outside the raster's {self.days} days from {self.metadata['start_date']}")
+        i, j, weights = self._corners(lat, lon)
+        return float((self.values[day, i:i + 2, j:j + 2] * weights).sum())
+
+    def eto_series(self, lat, lon, start_date, days):
+        """Interpolated ETo for `days` consecutive days from start_date, as a float64 array"""
+        first = self.day_index(start_date)
+        if first < 0 or first + days > self.days:
+            raise ValueError(f"{days} days from {start_date} are outside the raster's dates")
+        i, j, weights = self._corners(lat, lon)
+        return np.tensordot(self.values[first:first + days, i:i + 2, j:j + 2].astype(np.float64), weights, axes=2)
+
+# ================== EXECUTE REGIONAL MODE ==================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the district ETo raster and run many farms against it")
+    parser.add_argument("--path", default=REGIONAL_ETO_PATH)
+    parser.add_argument("--start", default=(datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d"),
+                        help="First raster date (YYYY-MM-DD), default one year ago")
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--half-extent", type=float, default=DISTRICT_HALF_EXTENT)
+    parser.add_argument("--resolution", type=float, default=GRID_RESOLUTION)
+    parser.add_argument("--stations-file", default=None,
+                        help="JSON list of {latitude, longitude, weather_data} forecasts to interpolate")
+    parser.add_argument("--farms", type=int, default=2000, help="Random farms in the district to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from formula_based_water_req import PROPERTY_REGISTRY, calculate_crop_water_batch
+    from water_metrics import set_quiet
+
+    constants = load_location_constants(LOCATION_CONSTANTS_CSV)
+    grid = RegionalGrid.around(constants['latitude'], constants['longitude'], args.half_extent, args.resolution)
+    stations = None
+    if args.stations_file:
+        with open(args.stations_file) as file:
+            stations = json.load(file)
+
+    started = time.perf_counter()
+    raster = build_eto_raster(args.path, grid, args.start, args.days, constants['elevation'], stations)
+    print(f"Built {grid.rows}x{grid.cols} x {args.days} day raster at {args.path} "
+          f"in {time.perf_counter() - started:.2f}s ({raster.values.nbytes / 1e6:.1f} MB)")
+
+    set_quiet()
+    rng = np.random.default_rng(args.seed)
+    crops, soils = list(PROPERTY_REGISTRY.crops()), list(PROPERTY_REGISTRY.soils())
+    first = datetime.strptime(args.start, "%Y-%m-%d")
+    latest_start = args.days - max(crop.total_days for crop in PROPERTY_REGISTRY.crops().values())
+    fields = [
+        {
+            'crop_name': crops[rng.integers(len(crops))],
+            'soil_type': soils[rng.integers(len(soils))],
+            'planting_date': (first + timedelta(days=int(rng.integers(max(latest_start, 1))))).strftime("%Y-%m-%d"),
+            'location': {
+                'latitude': float(rng.uniform(grid.lat0, grid.lat0 + grid.step * (grid.rows - 1))),
+                'longitude': float(rng.uniform(grid.lon0, grid.lon0 + grid.step * (grid.cols - 1))),
+                'elevation': constants['elevation']  # farms at other elevations fall back to per-point ETo
+            }
+        }
+        for _ in range(args.farms)
+    ]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        point_results = calculate_crop_water_batch(fields)
+        point_s = time.perf_counter() - started
+        started = time.perf_counter()
+        raster_results = calculate_crop_water_batch(fields, eto_raster=raster)
+        raster_s = time.perf_counter() - started
+
+    differences = [abs(a['total_water_liters_per_ha'] - b['total_water_liters_per_ha']) / a['total_water_liters_per_ha']
+                   for a, b in zip(point_results, raster_results)]
+    print(f"{args.farms} farms at the district elevation: per-point ETo {point_s:.2f}s, raster ETo {raster_s:.2f}s; "
+          f"max seasonal water difference {max(differences) * 100:.3f}%")
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ================== CACHE KEYS ==================
+def cache_key(*parts):
+    """Canonical SHA-256 key of JSON-serializable parts (dict key order does not matter)"""
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+# ================== TWO-TIER CACHE ==================
+class TwoTierCache:
+    """
+    Memoization cache with an in-memory LRU tier in front of an optional SQLite tier.
+
+    Entries older than `ttl` seconds (None = never) are treated as missing. The memory
+    tier keeps at most `max_memory_items` entries; the disk tier at `path` keeps at most
+    `max_disk_items`, dropping the least recently used ones first. Values are written to
+    disk with `dumps` and read back with `loads` (JSON by default). Thread-safe; several
+    processes may share the same SQLite file.
+    """
+
+    def __init__(self, path=None, max_memory_items=1024, max_disk_items=100000, ttl=None,
+                 dumps=json.dumps, loads=json.loads):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl = ttl
+        self.dumps = dumps
+        self.loads = loads
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_items = 0
+
+    def _connection(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+            self._db.commit()
+            self._disk_items = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return self._db
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def _remember(self, key, created, value):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self.memory_evictions += 1
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+            if self.path:
+                db = self._connection()
+                row = db.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if not self._expired(row[1], now):
+                        db.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+                        db.commit()
+                        value = self.loads(row[0])
+                        self._remember(key, row[1], value)
+                        self.disk_hits += 1
+                        return value
+                    self._disk_items -= db.execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount
+                    db.commit()
+
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self.path:
+                db = self._connection()
+                exists = db.execute("SELECT 1 FROM cache WHERE key = ?", (key,)).fetchone() is not None
+                db.execute("INSERT OR REPLACE INTO cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                           (key, self.dumps(value), now, now))
+                if not exists:
+                    self._disk_items += 1
+                if self._disk_items > self.max_disk_items:
+                    # Other processes may share the file: recount before evicting
+                    self._disk_items = db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+                    excess = self._disk_items - self.max_disk_items
+                    if excess > 0:
+                        # Drop the least recently used entries, with some slack so this does not run on every put
+                        excess += self.max_disk_items // 10
+                        deleted = db.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                                             (excess,)).rowcount
+                        self.disk_evictions += deleted
+                        self._disk_items -= deleted
+                db.commit()
+
+    def get_or_compute(self, key, compute):
+        """Cached value for `key`, or compute(), store and return it (None results are not cached)"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.path:
+                db = self._connection()
+                db.execute("DELETE FROM cache")
+                db.commit()
+                self._disk_items = 0
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+            'memory_evictions': self.memory_evictions,
+            'disk_evictions': self.disk_evictions,
+            'memory_items': len(self._memory)
+        }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,108 @@
+import argparse
+import io
+import contextlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from formula_based_water_req import DEFAULT_LOCATION, PROPERTY_REGISTRY, calculate_crop_water_batch
+
+# ================== SCENARIO GRID ==================
+def build_scenarios(start_date, days=365, step_days=1, crops=None, soils=None, location=None, weather_data=None):
+    """
+    Every (crop, soil, planting date) combination in the window, as calculate_crop_water_batch
+    fields. Raises ValueError for crop or soil names the registry does not know (the batch
+    engine would silently simulate Rice / Red Soil for them instead).
+    """
+    known_crops, known_soils = PROPERTY_REGISTRY.crops(), PROPERTY_REGISTRY.soils()
+    crops = crops or list(known_crops)
+    soils = soils or list(known_soils)
+    unknown_crops = [crop for crop in crops if crop not in known_crops]
+    unknown_soils = [soil for soil in soils if soil not in known_soils]
+    if unknown_crops or unknown_soils:
+        raise ValueError(f"Unknown crops {unknown_crops} / soils {unknown_soils}; "
+                         f"choose from {list(known_crops)} and {list(known_soils)}")
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    dates = [(start + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(0, days, step_days)]
+    return [
+        {
+            'crop_name': crop,
+            'soil_type': soil,
+            'planting_date': planting_date,
+            'weather_data': weather_data,
+            'location': location or DEFAULT_LOCATION
+        }
+        for crop in crops for soil in soils for planting_date in dates
+    ]
+
+# ================== SWEEP ==================
+def _init_sweep_worker(snapshot):
+    """Process pool initializer: reuse the parent's loaded profiles instead of re-reading the CSVs"""
+    PROPERTY_REGISTRY.restore(snapshot)
+
+def _simulate_chunk(fields):
+    """Run one chunk of scenarios through the vectorized batch engine and keep only the ranking columns"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = calculate_crop_water_batch(fields, include_peak_demand=True)
+    return [
+        {
+            'crop': field['crop_name'],
+            'soil': field['soil_type'],
+            'planting_date': field['planting_date'],
+            'total_water_mm': result['total_water_mm'],
+            'total_water_liters_per_acre': result['total_water_liters_per_acre'],
+            'irrigation_count': result['irrigation_count'],
+            'peak_daily_mm': result['peak_daily_mm'],
+            'first_irrigation_date': result['schedule'][0]['date'] if result['schedule'] else None
+        }
+        for field, result in zip(fields, results) if result
+    ]
+
+def sweep_scenarios(start_date, days=365, step_days=1, crops=None, soils=None, location=None,
+                    weather_data=None, workers=None, chunk_size=512):
+    """
+    Simulate every crop x soil x planting-date scenario in a window and rank them.
+
+    Scenarios are split into chunks that each run through calculate_crop_water_batch.
+    With workers > 1 the chunks are spread over a process pool whose workers receive
+    the already-loaded profiles once, at start-up. Returns a list of rows sorted by
+    total water, then irrigation count, then peak daily demand, each with its 'rank'.
+    """
+    fields = build_scenarios(start_date, days, step_days, crops, soils, location, weather_data)
+    chunks = [fields[i:i + chunk_size] for i in range(0, len(fields), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep_worker,
+                                 initargs=(PROPERTY_REGISTRY.snapshot(),)) as executor:
+            rows = [row for chunk_rows in executor.map(_simulate_chunk, chunks) for row in chunk_rows]
+    else:
+        rows = [row for chunk in chunks for row in _simulate_chunk(chunk)]
+
+    rows.sort(key=lambda row: (row['total_water_liters_per_acre'], row['irrigation_count'], row['peak_daily_mm']))
+    for rank, row in enumerate(rows, start=1):
+        row['rank'] = rank
+    return rows
+
+# ================== EXECUTE SWEEP ==================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank planting dates, crops and soils by water requirement")
+    parser.add_argument("--start", default=datetime.now().strftime("%Y-%m-%d"), help="First planting date (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=365, help="Length of the planting window in days")
+    parser.add_argument("--step", type=int, default=1, help="Days between candidate planting dates")
+    parser.add_argument("--crop", action="append", help="Limit to this crop (repeatable)")
+    parser.add_argument("--soil", action="append", help="Limit to this soil type (repeatable)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    started = datetime.now()
+    try:
+        rows = sweep_scenarios(args.start, args.days, args.step, args.crop, args.soil, workers=args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Simulated {len(rows)} scenarios in {(datetime.now() - started).total_seconds():.1f}s")
+    print(f"{'rank':>4}  {'crop':<10} {'soil':<18} {'planting':<10}  {'water mm':>8}  {'L/acre':>10}  {'events':>6}  {'peak mm':>7}")
+    for row in rows[:args.top]:
+        print(f"{row['rank']:>4}  {row['crop']:<10} {row['soil']:<18} {row['planting_date']:<10}  "
+              f"{row['total_water_mm']:>8}  {row['total_water_liters_per_acre']:>10}  {row['irrigation_count']:>6}  {row['peak_daily_mm']:>7}")
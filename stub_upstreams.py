@@ -0,0 +1,229 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-ins for the upstream services (the Node backend and OpenRouter), for
+# running the Python tools without them. Start one with `with StubBackend() as backend:`
+# and point the tool at backend.base_url.
+
+# ================== BACKEND STUB ==================
+SAMPLE_PREDICTION = {
+    'latitude': 9.2088,
+    'longitude': 77.2561,
+    'max_temp': 36,
+    'min_temp': 22,
+    'avg_wind_speed': 2.0,
+    'avg_relative_humidity': 60,
+    'total_rainfall': 0,
+    'elevation': 150,
+    'crop_type': 'Rice',
+    'soil_type': 'Red Soil',
+    'plantation_date': '2026-09-01T00:00:00.000Z'
+}
+
+STORE_PREDICTION_FIELDS = ('water_predicted', 'water_predicted_acre', 'next_water_date', 'water_frequency', 'simple_instruction')
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _send_json(self, status, body):
+        stub = self.server.stub
+        if stub.latency:
+            time.sleep(stub.latency)
+        retry_after = None
+        with stub.lock:
+            stub.request_count += 1
+            if stub.fail_next > 0:
+                stub.fail_next -= 1
+                status, body = stub.fail_status, {'error': 'Service Unavailable' if stub.fail_status == 503 else 'Rate limited'}
+                retry_after = stub.retry_after
+        data = json.dumps(body).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            if retry_after is not None:
+                self.send_header('Retry-After', str(retry_after))
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. hit its timeout) before the response was ready
+            self.close_connection = True
+
+class _BackendHandler(_StubHandler):
+    """Routes of backend/routes/predict.js that the Python tools call"""
+
+    def do_GET(self):
+        if self.path == '/api/crop/latest-prediction':
+            prediction = self.server.stub.latest_prediction
+            if prediction is None:
+                return self._send_json(404, {'error': 'No prediction data found'})
+            return self._send_json(200, prediction)
+        self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        body = self._read_json()
+        if self.path == '/api/crop/store-prediction':
+            # Same validation as the Node route: amounts must be present, the rest truthy
+            if ('water_predicted' not in body or 'water_predicted_acre' not in body or not body.get('next_water_date')
+                    or not body.get('water_frequency') or not body.get('simple_instruction')):
+                return self._send_json(400, {'error': f"All parameters ({', '.join(STORE_PREDICTION_FIELDS)}) are required"})
+            self.server.stub.stored.append(body)
+            return self._send_json(200, {'message': 'Prediction stored successfully'})
+        if self.path == '/api/crop/get-crop':
+            if not all(body.get(field) for field in ('crop_type', 'soil_type', 'plantation_date')):
+                return self._send_json(400, {'error': 'All parameters (crop_type, soil_type, plantation_date) are required'})
+            self.server.stub.crop_requests.append(body)
+            return self._send_json(200, dict(SAMPLE_PREDICTION, **body))
+        self._send_json(404, {'error': 'Not found'})
+
+class StubServer:
+    """
+    Runs a handler class on a local ThreadingHTTPServer in a background thread.
+
+    `latency` adds a fixed delay (seconds) to every response and the next `fail_next`
+    responses are replaced by `fail_status` errors (503 by default; with 429, the
+    `retry_after` header is sent when set), to exercise timeouts and retries.
+    """
+    handler_class = _StubHandler
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.server = ThreadingHTTPServer((host, port), self.handler_class)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.latency = latency
+        self.fail_next = 0
+        self.fail_status = 503
+        self.retry_after = None
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+class StubBackend(StubServer):
+    """
+    Stand-in for the Node backend: serves `latest_prediction` from
+    /api/crop/latest-prediction and records store-prediction and get-crop bodies.
+    """
+    handler_class = _BackendHandler
+
+    def __init__(self, latest_prediction=SAMPLE_PREDICTION, **kwargs):
+        super().__init__(**kwargs)
+        self.latest_prediction = latest_prediction
+        self.stored = []
+        self.crop_requests = []
+
+# ================== OPENROUTER STUB ==================
+STUB_SOILS = {'Red Soil': 'சிவப்பு மண்', 'Black Clayey Soil': 'கருப்பு களிமண்', 'Brown Soil': 'பழுப்பு மண்', 'Alluvial Soil': 'வண்டல் மண்'}
+STUB_CROPS = {'Rice': 'நெல்', 'Sugarcane': 'கரும்பு', 'Groundnut': 'நிலக்கடலை', 'Cotton': 'பருத்தி', 'Banana': 'வாழை'}
+STUB_CHAT_REPLY = ("Water your field early in the morning and check the soil a few centimetres down "
+                   "before the next irrigation. Mulching helps keep the moisture in during hot days.")
+
+def stub_completion(messages):
+    """
+    Deterministic stand-in for the model. Extraction prompts (system message asking for
+    JSON) get the soil, crop and YYYY-MM-DD date named in the user message; everything
+    else gets a fixed farming answer.
+    """
+    system = next((m['content'] for m in messages if m['role'] == 'system'), '')
+    text = ' '.join(m['content'] for m in messages if m['role'] == 'user')
+    if 'JSON' not in system:
+        return STUB_CHAT_REPLY
+    lowered = text.lower()
+    soil = next((name for name, tamil in STUB_SOILS.items() if name.lower() in lowered or tamil in text), None)
+    crop = next((name for name, tamil in STUB_CROPS.items() if name.lower() in lowered or tamil in text), None)
+    date = re.search(r"\d{4}-\d{2}-\d{2}", text)
+    return json.dumps({'soil_type': soil, 'crop_type': crop, 'planting_date': date.group(0) if date else None})
+
+class _OpenRouterHandler(_StubHandler):
+    """/api/v1/chat/completions, plain JSON or server-sent events when the request has stream=true"""
+
+    def do_POST(self):
+        body = self._read_json()
+        if self.path != '/api/v1/chat/completions':
+            return self._send_json(404, {'error': 'Not found'})
+        stub = self.server.stub
+        with stub.lock:
+            stub.prompts.append(body)
+        content = stub.completion(body.get('messages', []))
+        if not body.get('stream') or not stub.streaming:
+            return self._send_json(200, {'choices': [{'message': {'role': 'assistant', 'content': content}}]})
+        self._send_stream(content)
+
+    def _send_stream(self, content):
+        stub = self.server.stub
+        with stub.lock:
+            failing = stub.fail_next > 0
+        if failing:
+            return self._send_json(503, {'error': 'Service Unavailable'})
+        if stub.latency:
+            time.sleep(stub.latency)
+        with stub.lock:
+            stub.request_count += 1
+        self.close_connection = True  # the stream ends when the connection closes
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(b": OPENROUTER PROCESSING\n\n")
+            tokens = re.findall(r"\S+\s*", content)
+            for i, token in enumerate(tokens):
+                if stub.drop_stream_after is not None and i >= stub.drop_stream_after:
+                    return  # simulate a connection lost mid-stream
+                chunk = {'choices': [{'delta': {'content': token}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                if stub.token_delay:
+                    time.sleep(stub.token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+class StubOpenRouter(StubServer):
+    """
+    Stand-in for the OpenRouter chat completions API; point the client at
+    f"{stub.base_url}/api/v1/chat/completions".
+
+    Replies come from `completion(messages)` (stub_completion by default). Streaming
+    requests get server-sent events, one word per event, `token_delay` seconds apart;
+    streaming=False answers them with plain JSON instead, and drop_stream_after=N cuts
+    the connection after N events. Request bodies are recorded in `prompts`.
+    """
+    handler_class = _OpenRouterHandler
+
+    def __init__(self, completion=stub_completion, token_delay=0.0, streaming=True, **kwargs):
+        super().__init__(**kwargs)
+        self.completion = completion
+        self.token_delay = token_delay
+        self.streaming = streaming
+        self.drop_stream_after = None
+        self.prompts = []
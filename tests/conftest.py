@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# The tools are flat scripts at the repository root that read their CSV files relative to it
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'extras'))
+os.environ.setdefault("OPENROUTER_API_KEY", "test")  # llm.py and extras/extra.py refuse to import without one
+os.environ.setdefault("OPENROUTER_RPM", "60000")     # the stand-ins have no rate limit
+os.environ.setdefault("OPENROUTER_BURST", "1000")
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    monkeypatch.delenv("OPENWEATHER_API_KEY", raising=False)
+    monkeypatch.delenv("HTTP_TRANSPORT_MODE", raising=False)
+    return REPO_ROOT
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from async_backend_client import AsyncBackendClient, BackendRequestError
+from stub_upstreams import SAMPLE_PREDICTION
+
+def run_against(handlers, scenario):
+    """Run `scenario(client)` against an aiohttp app with `handlers` ({(method, path): handler})"""
+    async def main():
+        app = web.Application()
+        for (method, path), handler in handlers.items():
+            app.router.add_route(method, path, handler)
+        async with TestServer(app) as server:
+            async with AsyncBackendClient(str(server.make_url('')).rstrip('/'), retries=2, backoff=0.01) as client:
+                return await scenario(client)
+    return asyncio.run(main())
+
+def test_non_json_success_is_a_backend_error():
+    async def html(request):
+        return web.Response(text="<html>ngrok warning</html>", content_type='text/html')
+
+    async def scenario(client):
+        with pytest.raises(BackendRequestError) as error:
+            await client.get_latest_prediction()
+        return error.value
+
+    error = run_against({('GET', '/api/crop/latest-prediction'): html}, scenario)
+    assert error.status == 200 and 'non-JSON' in str(error)
+
+def test_get_is_retried_but_store_is_not():
+    calls = {'GET': 0, 'POST': 0}
+
+    async def flaky_get(request):
+        calls['GET'] += 1
+        if calls['GET'] == 1:
+            return web.json_response({'error': 'Service Unavailable'}, status=503)
+        return web.json_response(SAMPLE_PREDICTION)
+
+    async def failing_store(request):
+        calls['POST'] += 1
+        return web.json_response({'error': 'Bad Gateway'}, status=502)
+
+    async def scenario(client):
+        prediction = await client.get_latest_prediction()
+        with pytest.raises(BackendRequestError):
+            await client.store_prediction({'water_predicted': 1})
+        return prediction, client.retry_count
+
+    prediction, retries = run_against({
+        ('GET', '/api/crop/latest-prediction'): flaky_get,
+        ('POST', '/api/crop/store-prediction'): failing_store,
+    }, scenario)
+    assert prediction == SAMPLE_PREDICTION
+    assert calls == {'GET': 2, 'POST': 1}  # the store may have happened, so it is not sent twice
+    assert retries == 1
+
+def test_store_is_retried_when_the_connection_is_refused():
+    async def main():
+        async with AsyncBackendClient('http://127.0.0.1:9', retries=2, backoff=0.01) as client:
+            with pytest.raises(BackendRequestError):
+                await client.store_prediction({'water_predicted': 1})
+            return client.retry_count
+    assert asyncio.run(main()) == 2
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+import llm
+from chat_server import ChatServer
+from openrouter_limiter import OpenRouterLimiter
+from result_cache import TwoTierCache
+from stub_upstreams import StubBackend, StubOpenRouter, stub_completion
+
+class ConcurrencyProbe:
+    """stub_completion that takes `delay` seconds and records the most calls running at once"""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def __call__(self, messages):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        return stub_completion(messages)
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    probe = ConcurrencyProbe()
+    with StubOpenRouter(completion=probe) as openrouter, StubBackend() as backend:
+        monkeypatch.setattr(llm, 'URL', f"{openrouter.base_url}/api/v1/chat/completions")
+        monkeypatch.setattr(llm, 'BACKEND_API', f"{backend.base_url}/api/crop/get-crop")
+        monkeypatch.setattr(llm, 'LIMITER', OpenRouterLimiter(rate_per_minute=60000, burst=100))
+        monkeypatch.setattr(llm, 'extraction_cache', TwoTierCache(None))  # keep the on-disk cache out of tests
+        yield probe, backend
+
+def run_with_client(server, scenario):
+    async def main():
+        async with TestClient(TestServer(server.app())) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+async def start_session(client):
+    response = await client.post('/sessions')
+    assert response.status == 200
+    return (await response.json())['session_id']
+
+async def send(client, session_id, text):
+    response = await client.post(f'/sessions/{session_id}/messages', json={'text': text})
+    return response.status, await response.json()
+
+def test_sessions_keep_their_own_state(upstreams):
+    _, backend = upstreams
+
+    async def scenario(client):
+        first, second = await start_session(client), await start_session(client)
+        await send(client, first, "I have Red Soil")
+        await send(client, second, "We are growing Cotton this year")
+        _, done = await send(client, first, "Rice planted on 2026-07-01")
+        states = [await (await client.get(f'/sessions/{sid}')).json() for sid in (first, second)]
+        return done, states
+
+    done, (first, second) = run_with_client(ChatServer(), scenario)
+    assert done['stage'] == 'questions'
+    assert first['farming_info'] == {'soil_type': 'Red Soil', 'crop_type': 'Rice', 'planting_date': '2026-07-01'}
+    assert second['farming_info'] == {'soil_type': None, 'crop_type': 'Cotton', 'planting_date': None}
+    assert second['stage'] == 'soil'
+    assert len(backend.crop_requests) == 1
+
+def test_openrouter_calls_are_capped(upstreams):
+    probe, _ = upstreams
+
+    async def scenario(client):
+        sessions = [await start_session(client) for _ in range(8)]
+        # Distinct sentences, so neither the fast path nor the cache answers them
+        return await asyncio.gather(*(send(client, sid, f"Field {i} has Red Soil") for i, sid in enumerate(sessions)))
+
+    replies = run_with_client(ChatServer(openrouter_concurrency=2), scenario)
+    assert all(status == 200 for status, _ in replies)
+    assert probe.peak == 2
+
+def test_bad_bodies_are_rejected(upstreams):
+    async def scenario(client):
+        session_id = await start_session(client)
+        statuses = []
+        for body in ('["Red Soil"]', '"Red Soil"', 'not json', '{"text": 5}'):
+            response = await client.post(f'/sessions/{session_id}/messages', data=body,
+                                         headers={'Content-Type': 'application/json'})
+            statuses.append(response.status)
+        unknown = await client.post('/sessions/missing/messages', json={'text': 'Red Soil'})
+        return statuses, unknown.status
+
+    statuses, unknown = run_with_client(ChatServer(), scenario)
+    assert statuses == [400, 400, 400, 400]
+    assert unknown == 404
@@ -0,0 +1,50 @@
+import math
+
+import numpy as np
+
+import formula_based_water_req as water
+
+
+def baseline_eto(tmin, tmax, elevation, lat, doy, wind_speed=2.0, rh_min=45, rh_max=75):
+    """The original per-call FAO Penman-Monteith formula, without the radiation tables"""
+    lat_rad = math.radians(lat)
+    tmean = (tmax + tmin) / 2
+    es_tmin = 0.6108 * math.exp(17.27 * tmin / (tmin + 237.3))
+    es_tmax = 0.6108 * math.exp(17.27 * tmax / (tmax + 237.3))
+    es = (es_tmin + es_tmax) / 2
+    ea = (es_tmin * (rh_max/100) + es_tmax * (rh_min/100)) / 2
+    delta = 4098 * es / ((tmean + 237.3)**2)
+    gamma = 0.665e-3 * 101.3 * ((293 - 0.0065 * elevation)/293)**5.26
+    dr = 1 + 0.033 * math.cos(2 * math.pi * doy / 365)
+    delta_rad = 0.409 * math.sin(2 * math.pi * doy / 365 - 1.39)
+    ws = math.acos(-math.tan(lat_rad) * math.tan(delta_rad))
+    Ra = (24*60/math.pi) * 0.0820 * dr * (
+        ws * math.sin(lat_rad) * math.sin(delta_rad) +
+        math.cos(lat_rad) * math.cos(delta_rad) * math.sin(ws)
+    )
+    Rso = (0.75 + 2e-5 * elevation) * Ra
+    Rs = Ra * 0.5
+    Rn = (1 - 0.23) * Rs - 4.903e-9 * ((tmax + 273.16)**4 + (tmin + 273.16)**4)/2 * (0.34 - 0.14 * math.sqrt(ea)) * (1.35 * Rs/Rso - 0.35)
+    numerator = 0.408 * delta * Rn + gamma * (900/(tmean + 273)) * wind_speed * (es - ea)
+    return max(numerator / (delta + gamma * (1 + 0.34 * wind_speed)), 0)
+
+
+def test_high_latitude_matches_baseline_and_covers_polar_days():
+    lat = 70
+    doys = np.arange(1, 366)
+    batch = water.calculate_eto_batch(20, 30, 150, lat, doys)
+    fractional = water.calculate_eto_batch(20, 30, 150, lat, doys + 0.5)
+    assert np.all(np.isfinite(batch)) and np.all(np.isfinite(fractional))
+
+    polar_days = 0
+    for doy, batch_value in zip(doys.tolist(), batch.tolist()):
+        scalar = water.calculate_eto(20, 30, 150, lat, doy)
+        assert batch_value == scalar
+        try:
+            expected = baseline_eto(20, 30, 150, lat, doy)
+        except ValueError:
+            polar_days += 1  # the baseline formula had no value for polar day or night
+            continue
+        assert math.isclose(scalar, expected, rel_tol=1e-12)
+    assert polar_days > 0
+    assert math.isclose(water.calculate_eto(20, 30, 150, 70, 100), 3.1597, abs_tol=1e-4)
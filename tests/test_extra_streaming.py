@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+import extra
+from openrouter_limiter import OpenRouterLimiter
+from stub_upstreams import STUB_CHAT_REPLY, StubOpenRouter
+
+@pytest.fixture
+def openrouter(monkeypatch):
+    with StubOpenRouter() as stub:
+        monkeypatch.setattr(extra, 'URL', f"{stub.base_url}/api/v1/chat/completions")
+        monkeypatch.setattr(extra, 'LIMITER', OpenRouterLimiter(rate_per_minute=60000, burst=100))
+        yield stub
+
+def test_stream_tokens_are_parsed_and_passed_on(openrouter):
+    tokens = []
+    text, timing = extra.call_openrouter_api("How often should I water?", on_token=tokens.append)
+
+    assert text == STUB_CHAT_REPLY
+    assert "".join(tokens) == STUB_CHAT_REPLY and len(tokens) > 1
+    assert timing['streamed'] and timing['time_to_first_token_s'] is not None
+    assert openrouter.prompts[-1]['stream'] is True
+
+def test_dropped_stream_keeps_the_partial_reply(openrouter):
+    openrouter.drop_stream_after = 3
+    tokens = []
+    text, timing = extra.call_openrouter_api("How often should I water?", on_token=tokens.append)
+
+    assert len(tokens) == 3
+    assert text == "".join(tokens) and STUB_CHAT_REPLY.startswith(text)
+    assert timing['streamed']
+    assert len(openrouter.prompts) == 1  # no second request once text was shown
+
+def test_failed_stream_falls_back_to_a_plain_request(openrouter):
+    openrouter.fail_next = 1
+    text, timing = extra.call_openrouter_api("How often should I water?")
+
+    assert text == STUB_CHAT_REPLY
+    assert not timing['streamed']
+    assert [prompt.get('stream') for prompt in openrouter.prompts] == [True, None]
+
+def test_server_without_streaming_answers_with_json(openrouter):
+    openrouter.streaming = False
+    text, timing = extra.call_openrouter_api("How often should I water?")
+
+    assert text == STUB_CHAT_REPLY
+    assert not timing['streamed']
+    assert len(openrouter.prompts) == 1
+
+def test_history_is_sent_with_the_request(openrouter):
+    history = extra.ConversationHistory(extra.CHAT_SYSTEM_MESSAGE)
+    history.add_turn("My soil is Red Soil", "Noted.")
+    extra.call_openrouter_api("How often should I water?", history=history)
+
+    contents = [message['content'] for message in openrouter.prompts[-1]['messages']]
+    assert "My soil is Red Soil" in contents
+    assert contents[-1] == "How often should I water?"
+
+def test_rate_limited_stream_waits_for_retry_after(openrouter):
+    openrouter.fail_next = 1
+    openrouter.fail_status = 429
+    openrouter.retry_after = 1
+    started = time.monotonic()
+    text, timing = extra.call_openrouter_api("How often should I water?")
+
+    assert text == STUB_CHAT_REPLY
+    assert time.monotonic() - started >= 1
+    assert extra.LIMITER.stats()['rate_limited'] == 1
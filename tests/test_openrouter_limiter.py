@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from openrouter_limiter import PRIORITY_CHAT, PRIORITY_EXTRACTION, OpenRouterLimiter, RateLimitDropped
+
+class CountingLimiter(OpenRouterLimiter):
+    """Counts how often a waiter re-checks the bucket"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.refills = 0
+
+    def _refill(self, now):
+        self.refills += 1
+        super()._refill(now)
+
+def acquire_in_threads(limiter, priorities, order):
+    def run(priority, index):
+        limiter.acquire(priority)
+        order.append(index)
+    threads = [threading.Thread(target=run, args=(priority, index)) for index, priority in enumerate(priorities)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)  # deterministic arrival order
+    return threads
+
+def test_extraction_is_served_before_chat():
+    limiter = OpenRouterLimiter(rate_per_minute=600, burst=1)
+    limiter.acquire()  # empty the bucket so everyone queues
+    order = []
+    threads = acquire_in_threads(limiter, [PRIORITY_CHAT, PRIORITY_CHAT, PRIORITY_EXTRACTION], order)
+    for thread in threads:
+        thread.join(timeout=5)
+    assert order == [2, 0, 1]
+
+def test_queued_callers_do_not_poll():
+    limiter = CountingLimiter(rate_per_minute=600, burst=1)  # one token every 0.1 s
+    limiter.acquire()
+    order = []
+    threads = acquire_in_threads(limiter, [PRIORITY_CHAT] * 10, order)
+    for thread in threads:
+        thread.join(timeout=5)
+    assert len(order) == 10
+    # Only the head waiter checks the bucket, once or twice per token; waking every waiter takes ~80
+    assert limiter.refills < 40
+
+def test_rate_limit_pause_and_queue_limits():
+    limiter = OpenRouterLimiter(rate_per_minute=60000, burst=5, max_queue=1, max_wait=0.3)
+    limiter.report_rate_limited(retry_after=1.0)
+    errors = []
+
+    def waiter():
+        try:
+            limiter.acquire()  # the pause outlasts max_wait
+        except RateLimitDropped as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    with pytest.raises(RateLimitDropped, match="queue full"):
+        limiter.acquire()  # the one queue slot is taken: rejected at once, not after max_wait
+    assert time.monotonic() - started < 0.1
+    thread.join(timeout=5)
+    assert len(errors) == 1
+    stats = limiter.stats()
+    assert stats['dropped_queue_full'] == 1 and stats['dropped_timeout'] == 1
+
+def test_identical_calls_are_coalesced():
+    limiter = OpenRouterLimiter(rate_per_minute=60000, burst=100)
+    calls = []
+    release = threading.Event()
+
+    def slow_call():
+        calls.append(1)
+        release.wait(5)
+        return "reply"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(limiter.call(slow_call, key="same"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert results == ["reply"] * 5
+    assert len(calls) == 1 and limiter.stats()['coalesced'] == 4
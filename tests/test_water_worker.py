@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+import formula_based_water_req as water
+from stub_upstreams import SAMPLE_PREDICTION, StubBackend
+from water_metrics import set_quiet
+from water_worker import WaterCalculationWorker, create_backend_session
+
+set_quiet()
+
+@pytest.fixture
+def backend():
+    with StubBackend() as stub:
+        yield stub
+
+def start_worker(worker, poll=False):
+    thread = threading.Thread(target=worker.run, kwargs={'poll': poll}, daemon=True)
+    thread.start()
+    return thread
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        time.sleep(0.01)
+
+def test_submitted_jobs_are_calculated_stored_and_drained_on_stop(backend):
+    worker = WaterCalculationWorker(base_url=backend.base_url)
+    for crop in ('Rice', 'Cotton', 'Banana'):
+        worker.submit(dict(SAMPLE_PREDICTION, crop_type=crop))
+    thread = start_worker(worker)
+    worker.stop()  # queued jobs still finish before run() returns
+    thread.join(timeout=30)
+
+    assert not thread.is_alive()
+    assert worker.processed == 3 and worker.failed == 0
+    assert worker.queue_depth == 0
+    assert len(backend.stored) == 3
+    assert all(body['water_frequency'] for body in backend.stored)
+
+def test_failed_store_is_counted(backend):
+    worker = WaterCalculationWorker(base_url=backend.base_url)
+    backend.fail_next = 1
+    worker.submit(SAMPLE_PREDICTION)
+    thread = start_worker(worker)
+    worker.stop()
+    thread.join(timeout=30)
+
+    assert worker.processed == 0 and worker.failed == 1
+
+def test_poller_queues_each_prediction_once(backend):
+    worker = WaterCalculationWorker(base_url=backend.base_url, poll_interval=0.05)
+    thread = start_worker(worker, poll=True)
+    wait_for(lambda: worker.processed >= 1)
+    time.sleep(0.3)  # several more polls of the unchanged prediction
+    assert worker.processed == 1
+
+    backend.latest_prediction = dict(SAMPLE_PREDICTION, crop_type='Groundnut')
+    wait_for(lambda: worker.processed >= 2)
+    worker.stop()
+    thread.join(timeout=30)
+
+    assert not thread.is_alive()
+    assert len(backend.stored) == 2
+
+def test_shared_session_is_left_open(backend):
+    session = create_backend_session()
+    closed = []
+    session.close = lambda: closed.append(True)
+    worker = WaterCalculationWorker(base_url=backend.base_url, session=session)
+    worker.submit(SAMPLE_PREDICTION)
+    thread = start_worker(worker)
+    worker.stop()
+    thread.join(timeout=30)
+
+    assert worker.processed == 1
+    assert not closed
+
+def test_stalled_backend_times_out(monkeypatch):
+    monkeypatch.setattr(water, 'BACKEND_TIMEOUT', 0.2)
+    with StubBackend(latency=2) as stalled:
+        started = time.monotonic()
+        assert water.get_latest_prediction_data(stalled.base_url) is None
+        assert time.monotonic() - started < 1.5
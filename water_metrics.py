@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+
+# Lightweight instrumentation for the water calculator: timing spans around each
+# phase (load, weather prep, simulate, serialize, network), counters, and a pluggable
+# sink that receives them. Quiet mode (WATER_CALC_QUIET=1 or set_quiet()) turns spans,
+# counters and informational log lines into no-ops; errors are always printed.
+
+QUIET = os.environ.get('WATER_CALC_QUIET') == '1'
+
+# ================== SINKS ==================
+class MetricsSink:
+    """Receives instrumentation; subclass and override timing() and count()"""
+
+    def timing(self, name, seconds, tags):
+        pass
+
+    def count(self, name, value, tags):
+        pass
+
+class PrintSink(MetricsSink):
+    """Prints every span and counter as one line"""
+
+    def timing(self, name, seconds, tags):
+        print(f"[metrics] {name} {seconds * 1000:.2f} ms {tags or ''}")
+
+    def count(self, name, value, tags):
+        print(f"[metrics] {name} +{value} {tags or ''}")
+
+class InMemorySink(MetricsSink):
+    """Aggregates spans (calls, total, max seconds) and counters in memory; thread-safe"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.counters = {}
+
+    def timing(self, name, seconds, tags):
+        with self.lock:
+            entry = self.timings.setdefault(name, {'calls': 0, 'total_s': 0.0, 'max_s': 0.0})
+            entry['calls'] += 1
+            entry['total_s'] += seconds
+            entry['max_s'] = max(entry['max_s'], seconds)
+
+    def count(self, name, value, tags):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        with self.lock:
+            return {
+                'timings': {
+                    name: {
+                        'calls': entry['calls'],
+                        'total_ms': round(entry['total_s'] * 1000, 3),
+                        'avg_ms': round(entry['total_s'] * 1000 / entry['calls'], 3),
+                        'max_ms': round(entry['max_s'] * 1000, 3)
+                    }
+                    for name, entry in self.timings.items()
+                },
+                'counters': dict(self.counters)
+            }
+
+    def reset(self):
+        with self.lock:
+            self.timings.clear()
+            self.counters.clear()
+
+_sink = MetricsSink()
+
+def set_metrics_sink(sink):
+    """Install the sink that receives all spans and counters; returns the previous one"""
+    global _sink
+    previous, _sink = _sink, sink or MetricsSink()
+    return previous
+
+def get_metrics_sink():
+    return _sink
+
+def set_quiet(quiet=True):
+    """Turn instrumentation and informational logging off (True) or back on (False)"""
+    global QUIET
+    QUIET = quiet
+
+# ================== INSTRUMENTATION ==================
+class _Span:
+    __slots__ = ('name', 'tags', 'started')
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _sink.timing(self.name, time.perf_counter() - self.started, self.tags)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name, **tags):
+    """Context manager timing one phase: `with span('simulate', crop=crop_name): ...`"""
+    if QUIET:
+        return _NULL_SPAN
+    return _Span(name, tags)
+
+def increment(name, value=1, **tags):
+    """Add `value` to a counter"""
+    if not QUIET:
+        _sink.count(name, value, tags)
+
+def log(message):
+    """Informational log line, suppressed in quiet mode"""
+    if not QUIET:
+        print(message)
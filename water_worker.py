@@ -0,0 +1,183 @@
+import argparse
+import json
+import queue
+import signal
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from http_transport import configure_session
+from datetime import datetime
+
+from formula_based_water_req import (
+    BACKEND_BASE_URL,
+    PROPERTY_REGISTRY,
+    SeasonStateStore,
+    calculate_water_for_prediction,
+    create_result_cache,
+    fetch_forecast_for_prediction,
+    get_latest_prediction_data,
+    send_water_calculation_to_backend,
+)
+
+# ================== RESIDENT WORKER ==================
+def create_backend_session(pool_size=10):
+    """requests.Session with a keep-alive connection pool for the backend"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return configure_session(session)
+
+class WaterCalculationWorker:
+    """
+    Long-running water-calculation worker.
+
+    Keeps the crop/soil profiles, calendars and radiation tables warm in memory and
+    talks to the backend over one pooled keep-alive session. Jobs (backend prediction
+    records) arrive either from polling /api/crop/latest-prediction or through
+    submit(), and are processed in order: calculate, then store the result. With
+    OPENWEATHER_API_KEY set, each job first fetches the full forecast for its location.
+    stop() finishes the jobs already queued before the worker exits.
+    """
+
+    def __init__(self, base_url=BACKEND_BASE_URL, poll_interval=60, state_store=None, session=None, result_cache=None):
+        self.base_url = base_url
+        self.poll_interval = poll_interval
+        self.state_store = state_store
+        self.result_cache = result_cache
+        self._owns_session = session is None  # a caller's shared session is left open
+        self.session = session or create_backend_session()
+        self.jobs = queue.Queue()
+        self.processed = 0
+        self.failed = 0
+        self._stop_event = threading.Event()
+        self._last_prediction = None
+
+    @property
+    def queue_depth(self):
+        """Number of jobs waiting to be processed"""
+        return self.jobs.qsize()
+
+    def stats(self):
+        stats = {
+            'queue_depth': self.queue_depth,
+            'processed': self.processed,
+            'failed': self.failed
+        }
+        if self.result_cache:
+            stats['result_cache'] = self.result_cache.stats()
+        return stats
+
+    def warm_up(self):
+        """Load profiles and compile calendars before the first job arrives"""
+        PROPERTY_REGISTRY.calendars()
+
+    def submit(self, prediction_data):
+        """Queue a prediction record for calculation"""
+        self.jobs.put(prediction_data)
+
+    def poll_once(self):
+        """Queue the latest backend prediction if it changed since the last poll"""
+        prediction_data = get_latest_prediction_data(self.base_url, session=self.session)
+        if not prediction_data:
+            return False
+        fingerprint = json.dumps(prediction_data, sort_keys=True, default=str)
+        if fingerprint == self._last_prediction:
+            return False
+        self._last_prediction = fingerprint
+        self.submit(prediction_data)
+        return True
+
+    def process(self, prediction_data):
+        """Calculate and store one job; returns True on success"""
+        forecast_payload = fetch_forecast_for_prediction(prediction_data, session=self.session)
+        result = calculate_water_for_prediction(prediction_data, state_store=self.state_store, result_cache=self.result_cache,
+                                                forecast_payload=forecast_payload)
+        if not result:
+            return False
+        return send_water_calculation_to_backend(result, self.base_url, session=self.session)
+
+    def _poll_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Error polling for predictions: {e}")
+            self._stop_event.wait(self.poll_interval)
+
+    def _run_job(self, prediction_data):
+        try:
+            if self.process(prediction_data):
+                self.processed += 1
+            else:
+                self.failed += 1
+        except Exception as e:
+            print(f"Error processing job: {e}")
+            self.failed += 1
+        finally:
+            self.jobs.task_done()
+
+    def run(self, poll=True):
+        """Process jobs until stop() is called, then drain the queue"""
+        self.warm_up()
+        poller = None
+        if poll:
+            poller = threading.Thread(target=self._poll_loop, name="prediction-poller", daemon=True)
+            poller.start()
+
+        while not self._stop_event.is_set():
+            try:
+                self._run_job(self.jobs.get(timeout=0.5))
+            except queue.Empty:
+                continue
+
+        # Stop the poller before draining, so a poll finishing during shutdown still gets processed
+        if poller:
+            poller.join(timeout=self.poll_interval + 1)
+        while True:
+            try:
+                self._run_job(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        if self._owns_session:
+            self.session.close()
+        print(f"Worker stopped: {self.stats()}")
+
+    def stop(self, *_):
+        """Request a graceful shutdown (usable as a signal handler)"""
+        self._stop_event.set()
+
+# ================== EXECUTE WORKER ==================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident crop water calculation worker")
+    parser.add_argument("--base-url", default=BACKEND_BASE_URL, help="Backend base URL")
+    parser.add_argument("--poll-interval", type=float, default=60, help="Seconds between polls of the latest prediction")
+    parser.add_argument("--state-file", default=None, help="Season state file for incremental runs")
+    parser.add_argument("--cache-file", default=None, help="SQLite file for the result cache (memory only if omitted)")
+    parser.add_argument("--stub", action="store_true", help="Run against a local stub backend instead of --base-url")
+    args = parser.parse_args()
+
+    stub = None
+    base_url = args.base_url
+    if args.stub:
+        from stub_upstreams import StubBackend
+        stub = StubBackend().start()
+        base_url = stub.base_url
+
+    worker = WaterCalculationWorker(
+        base_url=base_url,
+        poll_interval=args.poll_interval,
+        state_store=SeasonStateStore(args.state_file) if args.state_file else None,
+        result_cache=create_result_cache(args.cache_file)
+    )
+    signal.signal(signal.SIGINT, worker.stop)
+    signal.signal(signal.SIGTERM, worker.stop)
+
+    print(f"Worker started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} against {base_url}")
+    started = time.time()
+    worker.run()
+    print(f"Worker ran for {time.time() - started:.1f}s")
+    if stub:
+        print(f"Stub backend stored {len(stub.stored)} calculations")
+        stub.stop()
@@ -0,0 +1,181 @@
+import argparse
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from formula_based_water_req import (
+    DEFAULT_LOCATION,
+    DEFAULT_WEATHER,
+    PROPERTY_REGISTRY,
+    align_weather_to_season,
+    calculate_eto_batch,
+    day_of_year_series,
+    load_location_constants,
+    step_water_balance,
+)
+
+LOCATION_CONSTANTS_CSV = 'krishnan_kovil_constants.csv'
+
+# Weather generator settings. The constants file only gives annual extremes and the
+# hottest/coolest/monsoon/dry months, so the seasonal swing and day-to-day noise
+# around them are fixed here.
+TEMP_SEASONAL_AMPLITUDE = 2.5   # °C above/below the annual values in the hottest/coolest months
+TEMP_ANOMALY_SD = 1.5           # °C, day-to-day temperature anomaly
+TEMP_ANOMALY_AUTOCORR = 0.7     # lag-1 autocorrelation of the temperature anomaly
+HUMIDITY_MEAN = 60              # %, same default as the calculator
+HUMIDITY_MONSOON_SHIFT = 15     # % added in monsoon months
+HUMIDITY_DRY_SHIFT = -10        # % added in dry months
+HUMIDITY_SD = 8
+WIND_MEDIAN = DEFAULT_WEATHER['wind_speed']
+WIND_LOG_SD = 0.35
+
+PERCENTILES = (10, 50, 90)
+
+# ================== CLIMATE ==================
+def _month_center_doy(months):
+    """Day of year in the middle of a set of months (e.g. [4, 5] -> ~May 1st)"""
+    return float(np.mean([datetime(2001, month, 15).timetuple().tm_yday for month in months]))
+
+def seasonal_index(doy, hottest_months, coolest_months):
+    """
+    +1 in the middle of the hottest months, -1 in the middle of the coolest months,
+    following a half cosine in between (the warming and cooling halves may differ in length).
+    """
+    peak = _month_center_doy(hottest_months)
+    trough = _month_center_doy(coolest_months)
+    doy = np.asarray(doy, dtype=np.float64)
+    warming_days = (peak - trough) % 365
+    since_trough = (doy - trough) % 365
+    warming = since_trough < warming_days
+    fraction = np.where(warming, since_trough / warming_days, (since_trough - warming_days) / (365 - warming_days))
+    return np.where(warming, -np.cos(np.pi * fraction), np.cos(np.pi * fraction))
+
+def climate_normals(constants, doy):
+    """Seasonal mean tmin, tmax (°C) and humidity (%) for each day of year"""
+    temperature = constants['temperature']
+    rainfall = constants['rainfall_pattern']
+    season = seasonal_index(doy, temperature['hottest_months'] or [4, 5], temperature['coolest_months'] or [11, 12])
+    tmin = (temperature['annual_min'] or DEFAULT_WEATHER['temp_min']) + TEMP_SEASONAL_AMPLITUDE * season
+    tmax = (temperature['annual_max'] or DEFAULT_WEATHER['temp_max']) + TEMP_SEASONAL_AMPLITUDE * season
+
+    month = (np.datetime64('2001-01-01') + (np.asarray(doy) - 1).astype('timedelta64[D]')).astype('datetime64[M]').astype(np.int64) % 12 + 1
+    humidity = np.full(np.shape(doy), float(HUMIDITY_MEAN))
+    humidity[np.isin(month, rainfall['monsoon_months'])] += HUMIDITY_MONSOON_SHIFT
+    humidity[np.isin(month, rainfall['dry_months'])] += HUMIDITY_DRY_SHIFT
+    return tmin, tmax, humidity
+
+def sample_weather(constants, doy, members, rng):
+    """
+    Draw `members` stochastic weather traces over the given days of year. Returns
+    (members, days) arrays of tmin, tmax, wind speed, RH min and RH max.
+    """
+    days = len(doy)
+    tmin_normal, tmax_normal, humidity_normal = climate_normals(constants, doy)
+
+    # AR(1) temperature anomaly shared by tmin and tmax
+    noise = rng.standard_normal((members, days)) * TEMP_ANOMALY_SD * np.sqrt(1 - TEMP_ANOMALY_AUTOCORR**2)
+    anomaly = np.empty((members, days))
+    anomaly[:, 0] = rng.standard_normal(members) * TEMP_ANOMALY_SD
+    for day in range(1, days):
+        anomaly[:, day] = TEMP_ANOMALY_AUTOCORR * anomaly[:, day - 1] + noise[:, day]
+
+    tmin = tmin_normal + anomaly
+    tmax = np.maximum(tmax_normal + anomaly, tmin + 2)
+    wind_speed = WIND_MEDIAN * np.exp(rng.standard_normal((members, days)) * WIND_LOG_SD)
+    humidity = np.clip(humidity_normal + rng.standard_normal((members, days)) * HUMIDITY_SD, 5, 100)
+
+    # Same min/max RH estimate as calculate_crop_water
+    return tmin, tmax, wind_speed, np.maximum(humidity - 15, 30), np.minimum(humidity + 15, 90)
+
+# ================== ENSEMBLE ==================
+def _percentiles(values, as_int=False):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {f'p{p}': None for p in PERCENTILES}
+    result = np.percentile(values, PERCENTILES)
+    return {f'p{p}': (int(round(v)) if as_int else round(float(v), 1)) for p, v in zip(PERCENTILES, result)}
+
+def simulate_weather_ensemble(crop_name, soil_type, planting_date, members=1000, location=None,
+                              weather_data=None, constants=None, seed=None):
+    """
+    Probabilistic water requirement for one field.
+
+    Runs `members` season simulations at once as (members, days) arrays, each with its
+    own stochastic weather trace drawn around the location's climate (from
+    krishnan_kovil_constants.csv unless `constants` is given). Forecast days in
+    `weather_data` are applied to every member. Returns P10/P50/P90 of total water,
+    irrigation count and first irrigation date.
+    """
+    soils = PROPERTY_REGISTRY.soils()
+    calendars = PROPERTY_REGISTRY.calendars()
+    if crop_name not in calendars:
+        print(f"Warning: Crop '{crop_name}' not found in database. Using Rice as default.")
+        crop_name = "Rice"
+    if soil_type not in soils:
+        print(f"Warning: Soil type '{soil_type}' not found in database. Using Red Soil as default.")
+        soil_type = "Red Soil"
+    calendar = calendars[crop_name]
+    location = location or DEFAULT_LOCATION
+    constants = constants or load_location_constants(LOCATION_CONSTANTS_CSV)
+    rng = np.random.default_rng(seed)
+
+    start_date = datetime.strptime(planting_date, "%Y-%m-%d")
+    days = calendar.total_days
+    doy = day_of_year_series([start_date], days)[0]
+    tmin, tmax, wind_speed, rh_min, rh_max = sample_weather(constants, doy, members, rng)
+
+    # Known forecast days (placed on their dates) replace the stochastic draws for every member;
+    # days without a record keep the sampled values
+    for day, day_weather in enumerate(align_weather_to_season(weather_data, start_date, days)):
+        if not day_weather:
+            continue
+        tmin[:, day] = day_weather.get('temp_min', DEFAULT_WEATHER['temp_min'])
+        tmax[:, day] = day_weather.get('temp_max', DEFAULT_WEATHER['temp_max'])
+        wind_speed[:, day] = day_weather.get('wind_speed', DEFAULT_WEATHER['wind_speed'])
+        humidity = day_weather.get('humidity', 60)
+        rh_min[:, day] = max(humidity - 15, 30)
+        rh_max[:, day] = min(humidity + 15, 90)
+
+    eto = calculate_eto_batch(tmin, tmax, location['elevation'], location['latitude'], doy, wind_speed, rh_min, rh_max)
+    etc = eto * calendar.kc
+    available_water_max = np.broadcast_to(calendar.available_water_max[soil_type], etc.shape)
+    critical_depletion = np.broadcast_to(calendar.critical_depletion, etc.shape)
+    total_water, events = step_water_balance(etc, available_water_max, critical_depletion)
+
+    irrigation_count = np.zeros(members)
+    first_irrigation_day = np.full(members, np.nan)
+    for day, rows, _ in events:
+        irrigation_count[rows] += 1
+        unset = rows[np.isnan(first_irrigation_day[rows])]
+        first_irrigation_day[unset] = day
+
+    first_day = _percentiles(first_irrigation_day, as_int=True)
+    return {
+        'crop': crop_name,
+        'soil': soil_type,
+        'planting_date': planting_date,
+        'members': members,
+        'total_water_mm': _percentiles(total_water),
+        'total_water_liters_per_ha': _percentiles(total_water * 10000, as_int=True),
+        'irrigation_count': _percentiles(irrigation_count, as_int=True),
+        'first_irrigation_date': {
+            p: (None if day is None else (start_date + timedelta(days=day)).strftime("%Y-%m-%d"))
+            for p, day in first_day.items()
+        }
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo weather ensemble for crop water requirements")
+    parser.add_argument("crop")
+    parser.add_argument("soil")
+    parser.add_argument("planting_date", help="YYYY-MM-DD")
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    started = datetime.now()
+    summary = simulate_weather_ensemble(args.crop, args.soil, args.planting_date, args.members, seed=args.seed)
+    print(json.dumps(summary, indent=2))
+    print(f"{args.members} members simulated in {(datetime.now() - started).total_seconds():.2f}s")
@@ -0,0 +1,128 @@
+import os
+import itertools
+import requests
+import numpy as np
+from http_transport import configure_session
+
+# OpenWeather 5 day / 3 hour forecast endpoint (same request as backend/routes/weather.js)
+FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
+
+# The backend stores the first five forecast dates per location
+FORECAST_DAYS = 5
+
+# Default session for forecast requests (recordable/replayable, see http_transport.py)
+HTTP_SESSION = configure_session(requests.Session())
+
+# ================== FETCH ==================
+def fetch_forecast(lat, lon, api_key=None, session=None, timeout=10):
+    """Fetch the raw 3-hourly forecast payload for one location"""
+    params = {
+        'lat': lat,
+        'lon': lon,
+        'units': 'metric',
+        'appid': api_key or os.getenv("OPENWEATHER_API_KEY")
+    }
+    response = (session or HTTP_SESSION).get(FORECAST_URL, params=params, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    if not data or 'list' not in data:
+        raise ValueError("Invalid response from OpenWeather API")
+    return data
+
+# ================== DAILY AGGREGATION ==================
+def _aggregate_chunk(payloads, max_days):
+    """
+    Aggregate the 3-hourly entries of several forecast payloads into per-day values.
+
+    Mirrors fetchWeatherData in backend/routes/weather.js: min/max temperature are the
+    extremes of the 3-hourly temp_min/temp_max, rainfall is the sum of rain['3h'], and
+    temperature/humidity/wind speed are taken from the 12:00:00 reading of each date.
+    All locations in the chunk are reduced together with NumPy scatter operations.
+    """
+    flat_day, temp_min, temp_max, rain = [], [], [], []
+    noon_day, noon_temp, noon_humidity, noon_wind = [], [], [], []
+    day_labels = []
+
+    for payload in payloads:
+        dates = {}
+        entries = payload.get('list') or []
+        day_labels.append(dates)
+        for entry in entries:
+            date, _, time = entry['dt_txt'].partition(' ')
+            day = dates.setdefault(date, len(dates))
+            flat_day.append((len(day_labels) - 1, day))
+            main = entry['main']
+            temp_min.append(main['temp_min'])
+            temp_max.append(main['temp_max'])
+            rain.append((entry.get('rain') or {}).get('3h', 0) or 0)
+            if time == "12:00:00":
+                noon_day.append(flat_day[-1])
+                noon_temp.append(main['temp'])
+                noon_humidity.append(main['humidity'])
+                noon_wind.append(entry['wind']['speed'])
+
+    width = max((len(dates) for dates in day_labels), default=0)
+    size = len(day_labels) * width
+    daily_min = np.full(size, np.inf)
+    daily_max = np.full(size, -np.inf)
+    daily_rain = np.zeros(size)
+    daily_temp, daily_humidity, daily_wind = (np.full(size, np.nan) for _ in range(3))
+
+    if flat_day:
+        index = np.array(flat_day, dtype=np.int64)
+        index = index[:, 0] * width + index[:, 1]
+        np.minimum.at(daily_min, index, temp_min)
+        np.maximum.at(daily_max, index, temp_max)
+        np.add.at(daily_rain, index, rain)
+    if noon_day:
+        index = np.array(noon_day, dtype=np.int64)
+        index = index[:, 0] * width + index[:, 1]
+        daily_temp[index] = noon_temp
+        daily_humidity[index] = noon_humidity
+        daily_wind[index] = noon_wind
+
+    columns = [values.reshape(len(day_labels), width).tolist() if width else [[]] * len(day_labels)
+               for values in (daily_min, daily_max, daily_rain, daily_temp, daily_humidity, daily_wind)]
+
+    for row, (payload, dates) in enumerate(zip(payloads, day_labels)):
+        weather_data = []
+        for date, day in itertools.islice(dates.items(), max_days):
+            record = {
+                'date': date,
+                'temp_min': columns[0][row][day],
+                'temp_max': columns[1][row][day],
+                'rainfall': columns[2][row][day],
+            }
+            # Dates without a 12:00 reading leave these out so the calculator uses its defaults
+            for key, values in (('temperature', columns[3]), ('humidity', columns[4]), ('wind_speed', columns[5])):
+                if not np.isnan(values[row][day]):
+                    record[key] = values[row][day]
+            weather_data.append(record)
+
+        coord = (payload.get('city') or {}).get('coord') or {}
+        yield {
+            'latitude': coord.get('lat'),
+            'longitude': coord.get('lon'),
+            'weather_data': weather_data
+        }
+
+def iter_daily_weather(payloads, chunk_size=256, max_days=FORECAST_DAYS):
+    """
+    Stream per-location daily weather series from raw 3-hourly forecast payloads.
+
+    `payloads` may be any iterable (e.g. a generator reading from disk or the network);
+    it is consumed `chunk_size` locations at a time, so memory stays bounded no matter
+    how many locations are processed. Yields one dict per payload, in input order, with
+    latitude, longitude and a `weather_data` list in the format calculate_crop_water
+    expects (date, temp_min, temp_max, humidity, wind_speed, rainfall).
+    """
+    payloads = iter(payloads)
+    while True:
+        chunk = list(itertools.islice(payloads, chunk_size))
+        if not chunk:
+            return
+        yield from _aggregate_chunk(chunk, max_days)
+
+def daily_weather_series(payload, max_days=FORECAST_DAYS):
+    """Daily weather_data list for a single raw forecast payload"""
+    return next(_aggregate_chunk([payload], max_days))['weather_data']